@@ -0,0 +1,440 @@
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter, perf_counter_ns
+
+from container import PriorityQueue
+from dispatcher import Dispatcher
+from driver import Driver
+from event import (Cancellation, DriverRequest, Dropoff, Pickup,
+                   RiderRequest, create_event_list)
+from location import make_location
+from monitor import Monitor, RIDER, DRIVER, REQUEST, PICKUP, DROPOFF
+from rider import Rider, WAITING
+from simulation import Simulation
+from sweep import build_scenario
+from workload import write_workload
+
+"""
+The bench module measures how the parts of the simulation scale: the whole
+Simulation.run, the PriorityQueue, Dispatcher.request_driver and
+Monitor.report, each at a series of sizes.
+
+Each benchmark gives its throughput in operations per second, the 50th,
+90th, 99th percentile and largest time of a single operation where single
+operations are timed, and the peak memory traced while it ran. Results are
+saved as JSON, and two saved runs can be compared to flag regressions.
+
+Each benchmark is timed REPEATS times, and the fastest run is kept, which
+keeps noise from being flagged as a regression. Timing a single operation
+adds the cost of reading the clock, about a tenth of a microsecond. Memory
+is traced in a separate pass, so it does not slow down the timed runs.
+
+Run 'python bench.py run results.json' to benchmark, or
+'python bench.py compare old.json new.json' to compare two runs. Add
+'--quick' to run to stop at smaller sizes, and '--threshold=0.2' to compare
+to flag only changes of more than 20%; the exit status is 1 if any
+regression is flagged.
+
+=== Constants ===
+@type EVENTS: list[int]
+    The numbers of events the Simulation and PriorityQueue are run on.
+@type DRIVERS: list[int]
+    The numbers of drivers the Dispatcher is run with.
+@type PERCENTILES: list[int]
+    The percentiles of operation times that are reported.
+@type REPEATS: int
+    The number of timed runs of each benchmark.
+"""
+
+EVENTS = [1000, 10000, 100000, 1000000]
+DRIVERS = [10, 100, 1000, 10000, 100000]
+PERCENTILES = [50, 90, 99]
+REPEATS = 3
+
+
+def run_benchmarks(events=EVENTS, drivers=DRIVERS, seed=0):
+    """Run every benchmark at every size, and return the results.
+
+    @type events: list[int]
+    @type drivers: list[int]
+    @type seed: int
+    @rtype: dict[str, object]
+    """
+    results = []
+    for count in events:
+        results.append(_measure("simulation", {"events": count},
+                                _simulation(count, seed)))
+        results.append(_measure("queue_add", {"events": count},
+                                _queue_add(count, seed)))
+        results.append(_measure("queue_remove", {"events": count},
+                                _queue_remove(count, seed)))
+        results.append(_measure("monitor_report", {"events": count},
+                                _monitor_report(count, seed)))
+    for count in drivers:
+        results.append(_measure("request_driver", {"drivers": count},
+                                _request_driver(count, seed)))
+    return {"python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results}
+
+
+def save_results(results, filename):
+    """Save <results> from run_benchmarks as JSON in <filename>.
+
+    @type results: dict[str, object]
+    @type filename: str
+    @rtype: None
+    """
+    with open(filename, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(filename):
+    """Return the results saved in <filename> by save_results.
+
+    @type filename: str
+    @rtype: dict[str, object]
+    """
+    with open(filename) as file:
+        return json.load(file)
+
+
+def compare_results(old, new, threshold=0.1):
+    """Return a description of each regression from <old> to <new> results:
+    a throughput that fell, or a 99th percentile time or peak memory that
+    rose, by more than <threshold> as a fraction of the old value.
+
+    Benchmarks that are in only one of the results are skipped.
+
+    @type old: dict[str, object]
+    @type new: dict[str, object]
+    @type threshold: float
+    @rtype: list[str]
+
+    >>> old = {"results": [{"name": "simulation", "size": {"events": 1000},
+    ...                     "ops_per_sec": 1000.0, "latency_ns": None,
+    ...                     "peak_bytes": 500}]}
+    >>> new = {"results": [{"name": "simulation", "size": {"events": 1000},
+    ...                     "ops_per_sec": 800.0, "latency_ns": None,
+    ...                     "peak_bytes": 520}]}
+    >>> compare_results(old, new)
+    ['simulation events=1000: ops_per_sec 1000 -> 800 (-20%)']
+    >>> compare_results(old, old)
+    []
+    """
+    before = {_key(result): result for result in old["results"]}
+    regressions = []
+    for result in new["results"]:
+        previous = before.get(_key(result))
+        if previous is None:
+            continue
+        checks = [("ops_per_sec", previous["ops_per_sec"], result["ops_per_sec"], -1),
+                  ("peak_bytes", previous["peak_bytes"], result["peak_bytes"], 1)]
+        if previous["latency_ns"] and result["latency_ns"]:
+            checks.append(("p99_ns", previous["latency_ns"]["p99"],
+                           result["latency_ns"]["p99"], 1))
+        for measure, was, now, worse in checks:
+            if was and (now - was) / was * worse > threshold:
+                regressions.append("{}: {} {:.0f} -> {:.0f} ({:+.0%})".format(
+                    _key(result), measure, was, now, (now - was) / was))
+    return regressions
+
+
+def percentiles(times):
+    """Return the PERCENTILES and the largest of <times>, by nearest rank.
+
+    @type times: list[int]
+        Precondition: times is not empty.
+    @rtype: dict[str, int]
+
+    >>> percentiles(list(range(1, 101)))
+    {'p50': 50, 'p90': 90, 'p99': 99, 'max': 100}
+    """
+    times = sorted(times)
+    summary = {}
+    for percent in PERCENTILES:
+        rank = max(-(-percent * len(times) // 100), 1)
+        summary["p{}".format(percent)] = times[rank - 1]
+    summary["max"] = times[-1]
+    return summary
+
+
+def _key(result):
+    """Return the name and size of a benchmark <result>, as a string.
+
+    @type result: dict[str, object]
+    @rtype: str
+    """
+    return " ".join([result["name"]] + ["{}={}".format(name, value) for name, value
+                                        in sorted(result["size"].items())])
+
+
+def _measure(name, size, benchmark):
+    """Run <benchmark> REPEATS times, timed, and once more with memory
+    traced, and return its result.
+
+    A benchmark is a pair of functions: the first prepares the benchmark and
+    returns its state, the second runs it on that state and returns the
+    number of operations done and the time of each operation in
+    nanoseconds, or None if operations are not timed one by one.
+
+    @type name: str
+    @type size: dict[str, int]
+    @type benchmark: (callable, callable)
+    @rtype: dict[str, object]
+    """
+    prepare, run = benchmark
+    best = None
+    for _ in range(REPEATS):
+        state = prepare()
+        start = perf_counter()
+        operations, times = run(state)
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best[1]:
+            best = (operations, elapsed, times)
+    operations, elapsed, times = best
+
+    state = prepare()
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"name": name, "size": size,
+            "ops_per_sec": operations / elapsed if elapsed else None,
+            "latency_ns": percentiles(times) if times else None,
+            "peak_bytes": peak}
+
+
+def _simulation(count, seed):
+    """Return a benchmark of Simulation.run on a random workload of <count>
+    events, with one driver for every ten riders.
+
+    Each run gets its own copy of the drivers and riders, since a simulation
+    changes them.
+
+    @type count: int
+    @type seed: int
+    @rtype: (callable, callable)
+    """
+    folder = tempfile.mkdtemp()
+    filename = os.path.join(folder, "events.txt")
+    fleet_size = max(count // 11, 1)
+    try:
+        write_workload(filename, count - fleet_size, seed=seed,
+                       grid_size=max(int((count / 10) ** 0.5), 10),
+                       fleet_size=fleet_size, rate=fleet_size / 20)
+        events = create_event_list(filename)
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rmdir(folder)
+
+    def prepare():
+        return build_scenario(events, {})
+
+    def run(copies):
+        Simulation().run(copies)
+        return len(copies), None
+
+    return prepare, run
+
+
+def _queue_add(count, seed):
+    """Return a benchmark of adding <count> events at random times to a
+    PriorityQueue.
+
+    @type count: int
+    @type seed: int
+    @rtype: (callable, callable)
+    """
+    timestamps = _timestamps(count, seed)
+
+    def prepare():
+        return PriorityQueue(), _events(timestamps)
+
+    def run(state):
+        queue, items = state
+        times = []
+        for item in items:
+            start = perf_counter_ns()
+            queue.add(item)
+            times.append(perf_counter_ns() - start)
+        return len(items), times
+
+    return prepare, run
+
+
+def _queue_remove(count, seed):
+    """Return a benchmark of removing every event from a PriorityQueue of
+    <count> events at random times.
+
+    @type count: int
+    @type seed: int
+    @rtype: (callable, callable)
+    """
+    timestamps = _timestamps(count, seed)
+
+    def prepare():
+        queue = PriorityQueue()
+        for event in _events(timestamps):
+            queue.add(event)
+        return queue
+
+    def run(queue):
+        times = []
+        while not queue.is_empty():
+            start = perf_counter_ns()
+            queue.remove()
+            times.append(perf_counter_ns() - start)
+        return len(times), times
+
+    return prepare, run
+
+
+def _request_driver(count, seed):
+    """Return a benchmark of 1000 calls to Dispatcher.request_driver, with
+    <count> available drivers spread over a grid that grows with <count>.
+
+    @type count: int
+    @type seed: int
+    @rtype: (callable, callable)
+    """
+    generator = random.Random(seed)
+    size = max(int(count ** 0.5) * 4, 10)
+    drivers = [(generator.randrange(size), generator.randrange(size),
+                generator.choice((1, 2, 3))) for _ in range(count)]
+    riders = [Rider("r{}".format(i), WAITING,
+                    make_location(generator.randrange(size), generator.randrange(size)),
+                    make_location(generator.randrange(size), generator.randrange(size)),
+                    10) for i in range(1000)]
+
+    def prepare():
+        dispatcher = Dispatcher()
+        dispatcher.register_drivers(Driver("d{}".format(i), make_location(row, column), speed)
+                                    for i, (row, column, speed) in enumerate(drivers))
+        return dispatcher
+
+    def run(dispatcher):
+        times = []
+        for rider in riders:
+            start = perf_counter_ns()
+            dispatcher.request_driver(rider)
+            times.append(perf_counter_ns() - start)
+        return len(riders), times
+
+    return prepare, run
+
+
+def _monitor_report(count, seed):
+    """Return a benchmark of Monitor.report on a monitor notified of about
+    <count> activities, a third of them by drivers.
+
+    The report is computed five times, and each is timed.
+
+    @type count: int
+    @type seed: int
+    @rtype: (callable, callable)
+    """
+    generator = random.Random(seed)
+    riders = max(count // 4, 1)
+    drivers = max(riders // 10, 1)
+    monitor = Monitor()
+    for i in range(riders):
+        timestamp = 2 * i
+        origin = make_location(generator.randrange(100), generator.randrange(100))
+        destination = make_location(generator.randrange(100), generator.randrange(100))
+        driver = "d{}".format(generator.randrange(drivers))
+        monitor.notify(timestamp, RIDER, REQUEST, "r{}".format(i), origin)
+        monitor.notify(timestamp + 1, RIDER, PICKUP, "r{}".format(i), origin)
+        monitor.notify(timestamp + 1, DRIVER, PICKUP, driver, origin)
+        monitor.notify(timestamp + 2, RIDER, DROPOFF, "r{}".format(i), destination)
+    for i in range(drivers):
+        monitor.notify(0, DRIVER, REQUEST, "d{}".format(i), make_location(0, 0))
+
+    def prepare():
+        return monitor
+
+    def run(monitor):
+        times = []
+        for _ in range(5):
+            start = perf_counter_ns()
+            monitor.report()
+            times.append(perf_counter_ns() - start)
+        return len(times), times
+
+    return prepare, run
+
+
+def _timestamps(count, seed):
+    """Return <count> random timestamps.
+
+    @type count: int
+    @type seed: int
+    @rtype: list[int]
+    """
+    generator = random.Random(seed)
+    return [generator.randrange(count) for _ in range(count)]
+
+
+def _events(timestamps):
+    """Return an event at each of <timestamps>, of each kind the simulation
+    queues in turn, so that the queue pays for the comparisons of real
+    events.
+
+    @type timestamps: list[int]
+    @rtype: list[Event]
+    """
+    driver = Driver("bench", make_location(0, 0), 1)
+    rider = Rider("bench", WAITING, make_location(0, 0), make_location(1, 1), 1)
+    kinds = (lambda timestamp: RiderRequest(timestamp, rider),
+             lambda timestamp: DriverRequest(timestamp, driver),
+             lambda timestamp: Pickup(timestamp, rider, driver),
+             lambda timestamp: Dropoff(timestamp, driver, rider),
+             lambda timestamp: Cancellation(timestamp, rider))
+    return [kinds[i % len(kinds)](timestamp)
+            for i, timestamp in enumerate(timestamps)]
+
+
+def _main(arguments):
+    """Run the command line in <arguments>, and return the exit status.
+
+    @type arguments: list[str]
+    @rtype: int
+    """
+    options = [argument for argument in arguments if argument.startswith("--")]
+    arguments = [argument for argument in arguments if argument not in options]
+    if len(arguments) == 2 and arguments[0] == "run":
+        if "--quick" in options:
+            results = run_benchmarks(EVENTS[:2], DRIVERS[:3])
+        else:
+            results = run_benchmarks()
+        save_results(results, arguments[1])
+        for result in results["results"]:
+            print(_key(result), result["ops_per_sec"], result["latency_ns"],
+                  result["peak_bytes"])
+        return 0
+    if len(arguments) == 3 and arguments[0] == "compare":
+        threshold = 0.1
+        for option in options:
+            if option.startswith("--threshold="):
+                threshold = float(option[len("--threshold="):])
+        regressions = compare_results(load_results(arguments[1]),
+                                      load_results(arguments[2]), threshold)
+        for regression in regressions:
+            print(regression)
+        return 1 if regressions else 0
+    print("usage: python bench.py run RESULTS.json [--quick]\n"
+          "       python bench.py compare OLD.json NEW.json [--threshold=0.1]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
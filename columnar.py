@@ -0,0 +1,244 @@
+from array import array
+
+import numpy as np
+
+from location import Location, make_location, manhattan_distance
+from monitor import Activity, Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
+
+"""
+The columnar module contains the ColumnarMonitor class, a monitor that keeps
+its record of activities in typed arrays and computes its report with NumPy.
+
+This module needs NumPy; the rest of the simulation does not.
+"""
+
+
+class ColumnarMonitor(Monitor):
+    """A monitor that keeps a full record of activities, one typed array per
+    field, and computes its report with vectorized NumPy operations.
+
+    Each activity takes a few dozen bytes instead of a few hundred, and the
+    report is the same as a Monitor's would be for the same activities.
+    The records can still be read as a Monitor's dictionary of Activity
+    lists through the _activities attribute, which is built on demand and
+    must not be modified.
+    """
+
+    # === Private Attributes ===
+    # @type _time: array[int]
+    #       The time of each activity, in the order they were recorded.
+    # @type _category: array[int]
+    #       The category of each activity: 0 for RIDER and 1 for DRIVER.
+    # @type _description: array[int]
+    #       The index of the description of each activity in _descriptions.
+    # @type _actor: array[int]
+    #       The index of the identifier of each activity's actor in _names.
+    # @type _row: array[int]
+    #       The row of the location of each activity.
+    # @type _column: array[int]
+    #       The column of the location of each activity.
+    # @type _descriptions: list[str]
+    #       The descriptions seen so far.
+    # @type _codes: dict[str, int]
+    #       Maps each description seen to its index in _descriptions.
+    # @type _names: list[str]
+    #       The actor identifiers seen so far.
+    # @type _actors: dict[str, dict[str, int]]
+    #       Maps each category to a dictionary that maps the identifier of
+    #       every actor in that category to its index in _names.
+    # @type _view: dict[str, dict[str, list[Activity]]] | None
+    #       The dictionary view of the records, if it has been built since
+    #       the last activity was recorded.
+
+    def __init__(self, travel=manhattan_distance):
+        """Initialize a ColumnarMonitor.
+
+        @type self: ColumnarMonitor
+        @type travel: callable
+            The distance driven from one location to another.
+        """
+        self.travel = travel
+        self._time = array("q")
+        self._category = array("b")
+        self._description = array("b")
+        self._actor = array("i")
+        self._row = array("i")
+        self._column = array("i")
+        self._descriptions = [REQUEST, CANCEL, PICKUP, DROPOFF]
+        self._codes = {description: code for code, description
+                       in enumerate(self._descriptions)}
+        self._names = []
+        self._actors = {RIDER: {}, DRIVER: {}}
+        self._view = None
+
+    def __str__(self):
+        """Return a string representation.
+
+        @type self: ColumnarMonitor
+        @rtype: str
+        """
+        return "Monitor ({0} drivers, {1} riders)".format(len(self._actors[DRIVER]), len(self._actors[RIDER]))
+
+    @property
+    def _activities(self):
+        """The records of this monitor, as a Monitor would keep them.
+
+        @type self: ColumnarMonitor
+        @rtype: dict[str, dict[str, list[Activity]]]
+        >>> monitor = ColumnarMonitor()
+        >>> monitor.notify(0, DRIVER, REQUEST, "driver", Location(1, 1))
+        >>> monitor.notify(3, DRIVER, PICKUP, "driver", Location(1, 3))
+        >>> [str(activity.location) for activity in monitor._activities[DRIVER]["driver"]]
+        ['1,1', '1,3']
+        """
+        if self._view is None:
+            view = {RIDER: {}, DRIVER: {}}
+            for i in range(len(self._time)):
+                category = DRIVER if self._category[i] else RIDER
+                identifier = self._names[self._actor[i]]
+                activity = Activity(self._time[i], self._descriptions[self._description[i]],
+                                    identifier, make_location(self._row[i], self._column[i]))
+                view[category].setdefault(identifier, []).append(activity)
+            self._view = view
+        return self._view
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity.
+
+        @type self: ColumnarMonitor
+        @type timestamp: int
+            The time of the activity.
+        @type category: DRIVER | RIDER
+            The category for the activity.
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+            A description of the activity.
+        @type identifier: str
+            The identifier for the actor.
+        @type location: Location
+            The location of the activity.
+        @rtype: None
+        """
+        actors = self._actors[category]
+        actor = actors.get(identifier)
+        if actor is None:
+            actor = actors[identifier] = len(self._names)
+            self._names.append(identifier)
+        code = self._codes.get(description)
+        if code is None:
+            code = self._codes[description] = len(self._descriptions)
+            self._descriptions.append(description)
+        self._time.append(timestamp)
+        self._category.append(category == DRIVER)
+        self._description.append(code)
+        self._actor.append(actor)
+        self._row.append(location.row)
+        self._column.append(location.column)
+        self._view = None
+
+    def _average_wait_time(self):
+        """Return the average wait time of riders that have either been picked
+        up or have cancelled their ride.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        >>> monitor = ColumnarMonitor()
+        >>> monitor.notify(1, RIDER, REQUEST, "ann", Location(1, 3))
+        >>> monitor.notify(2, RIDER, REQUEST, "bob", Location(2, 2))
+        >>> monitor.notify(3, RIDER, PICKUP, "ann", Location(1, 3))
+        >>> monitor.notify(6, RIDER, CANCEL, "bob", Location(2, 2))
+        >>> print(monitor._average_wait_time())
+        3.0
+        """
+        rows, starts, sizes = self._group(RIDER)
+        # A rider with less than two activities hasn't finished waiting. The
+        # first activity is REQUEST, and the second is PICKUP or CANCEL.
+        waited = starts[sizes >= 2]
+        time = np.frombuffer(self._time, dtype=np.int64)
+        wait_time = int((time[rows[waited + 1]] - time[rows[waited]]).sum())
+        return wait_time / len(waited)
+
+    def _average_total_distance(self):
+        """Return the average distance drivers have driven.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        >>> monitor = ColumnarMonitor()
+        >>> monitor.notify(5, DRIVER, PICKUP, "driver", Location(5, 15))
+        >>> monitor.notify(15, DRIVER, DROPOFF, "driver", Location(10, 25))
+        >>> print(monitor._average_total_distance())
+        15.0
+        """
+        rows, starts, sizes = self._group(DRIVER)
+        # Consecutive activities of the same driver mark a leg of driving.
+        actors = self._actor_array()[rows]
+        same = actors[1:] == actors[:-1]
+        distance = self._distances(rows[:-1][same], rows[1:][same])
+        return distance / len(starts)
+
+    def _average_ride_distance(self):
+        """Return the average distance drivers have driven on rides.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        >>> monitor = ColumnarMonitor()
+        >>> monitor.notify(5, RIDER, REQUEST, "rider", Location(5, 15))
+        >>> monitor.notify(10, RIDER, PICKUP, "rider", Location(5, 10))
+        >>> monitor.notify(15, RIDER, DROPOFF, "rider", Location(20, 15))
+        >>> for name in "abc":
+        ...     monitor.notify(0, DRIVER, REQUEST, name, Location(0, 0))
+        >>> print(monitor._average_ride_distance())
+        6.666666666666667
+        """
+        rows, starts, sizes = self._group(RIDER)
+        # A rider with 3 activities was picked up and then dropped off.
+        picked_up = starts[sizes == 3]
+        distance = self._distances(rows[picked_up + 1], rows[picked_up + 2])
+        return distance / len(self._actors[DRIVER])
+
+    def _group(self, category):
+        """Return the indices of the activities in <category>, grouped by
+        actor, along with the start and size of each group.
+
+        Within a group the activities stay in the order they were recorded,
+        and the groups are in the order their actors were first seen.
+
+        @type self: ColumnarMonitor
+        @type category: DRIVER | RIDER
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        categories = np.frombuffer(self._category, dtype=np.int8)
+        rows = np.flatnonzero(categories == (category == DRIVER))
+        rows = rows[np.argsort(self._actor_array()[rows], kind="stable")]
+        actors = self._actor_array()[rows]
+        starts = np.flatnonzero(np.r_[True, actors[1:] != actors[:-1]][:len(rows)])
+        sizes = np.diff(np.r_[starts, len(rows)])
+        return rows, starts, sizes
+
+    def _actor_array(self):
+        """Return the actor column as a NumPy array, without copying it.
+
+        @type self: ColumnarMonitor
+        @rtype: numpy.ndarray
+        """
+        return np.frombuffer(self._actor, dtype=np.int32)
+
+    def _distances(self, origins, destinations):
+        """Return the total distance driven from the locations of the
+        activities at <origins> to those at <destinations>.
+
+        The distances are computed at once for the Manhattan distance, and
+        one pair at a time for any other travel model.
+
+        @type self: ColumnarMonitor
+        @type origins: numpy.ndarray
+        @type destinations: numpy.ndarray
+        @rtype: int
+        """
+        row = np.frombuffer(self._row, dtype=np.int32).astype(np.int64)
+        column = np.frombuffer(self._column, dtype=np.int32).astype(np.int64)
+        if self.travel is not manhattan_distance:
+            return sum(self.travel(make_location(int(row[origin]), int(column[origin])),
+                                   make_location(int(row[destination]), int(column[destination])))
+                       for origin, destination in zip(origins.tolist(), destinations.tolist()))
+        return int((np.abs(row[origins] - row[destinations])
+                    + np.abs(column[origins] - column[destinations])).sum())
@@ -1,3 +1,53 @@
+from collections import OrderedDict, deque
+from heapq import heapify, heappop, heappush
+
+
+class Handle:
+    """A reference to an item that was added to a Container.
+
+    Cancelling the handle withdraws the item: it is skipped, and never
+    returned, when the container gets to it. Cancelling takes constant time.
+
+    === Attributes ===
+    @type item: object
+        The item that was added.
+    @type cancelled: bool
+        True iff the item has been withdrawn from its container.
+    @type step: int
+        The step of the container's user during which the item was added,
+        for users that number their steps, or 0.
+    """
+
+    __slots__ = ("item", "cancelled", "step")
+
+    def __init__(self, item):
+        """Initialize a Handle for <item>.
+
+        @type self: Handle
+        @type item: object
+        @rtype: None
+        """
+        self.item = item
+        self.cancelled = False
+        self.step = 0
+
+    def cancel(self):
+        """Withdraw the item from its container.
+
+        Cancelling an item that has already been removed has no effect.
+
+        @type self: Handle
+        @rtype: None
+
+        >>> pq = PriorityQueue()
+        >>> handle = pq.add("red")
+        >>> handle.cancel()
+        >>> pq.is_empty()
+        True
+        """
+        self.cancelled = True
+
+
 class Container:
     """A container that holds objects.
 
@@ -7,12 +57,27 @@ class Container:
     def add(self, item):
         """Add <item> to this Container.
 
+        Return a Handle that can be used to withdraw <item> before it is
+        removed.
+
         @type self: Container
         @type item: Object
-        @rtype: None
+        @rtype: Handle
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def add_all(self, items):
+        """Add every item in <items> to this Container, in order.
+
+        Subclasses may override this with a faster bulk operation.
+
+        @type self: Container
+        @type items: iterable[Object]
+        @rtype: None
+        """
+        for item in items:
+            self.add(item)
+
     def remove(self):
         """Remove and return a single item from this Container.
 
@@ -21,6 +86,14 @@ class Container:
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def peek(self):
+        """Return the item that remove would return next, without removing it.
+
+        @type self: Container
+        @rtype: Object
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
     def is_empty(self):
         """Return True iff this Container is empty.
 
@@ -30,6 +103,112 @@ class Container:
         raise NotImplementedError("Implemented in a subclass")
 
 
+class IndexedQueue:
+    """A first-in, first-out queue of items that can also be taken out of
+    the middle of the queue.
+
+    Items are looked up by their id attribute, so appending an item, taking
+    the item at the front, and removing any given item all take constant
+    time. All items in the queue must have distinct ids.
+    """
+
+    # === Private Attributes ===
+    # @type _items: OrderedDict[str, object]
+    #     The items in the queue, by id, from front to back.
+
+    def __init__(self):
+        """Initialize an empty IndexedQueue.
+
+        @type self: IndexedQueue
+        @rtype: None
+        """
+        self._items = OrderedDict()
+
+    def __len__(self):
+        """Return the number of items in this IndexedQueue.
+
+        @type self: IndexedQueue
+        @rtype: int
+        """
+        return len(self._items)
+
+    def __iter__(self):
+        """Return an iterator over the items in this IndexedQueue, from front
+        to back.
+
+        @type self: IndexedQueue
+        @rtype: iterator[object]
+        """
+        return iter(list(self._items.values()))
+
+    def __contains__(self, item):
+        """Return True iff <item> is in this IndexedQueue.
+
+        @type self: IndexedQueue
+        @type item: object
+        @rtype: bool
+        """
+        return self._items.get(item.id) is item
+
+    def append(self, item):
+        """Add <item> to the back of this IndexedQueue.
+
+        @type self: IndexedQueue
+        @type item: object
+        @rtype: None
+        """
+        self._items[item.id] = item
+
+    def peek(self):
+        """Return the item at the front of this IndexedQueue.
+
+        Precondition: <self> should not be empty.
+
+        @type self: IndexedQueue
+        @rtype: object
+        """
+        return next(iter(self._items.values()))
+
+    def pop(self):
+        """Remove and return the item at the front of this IndexedQueue.
+
+        Precondition: <self> should not be empty.
+
+        @type self: IndexedQueue
+        @rtype: object
+
+        >>> from rider import Rider
+        >>> queue = IndexedQueue()
+        >>> for name in ["ann", "bob", "cat"]:
+        ...     queue.append(Rider(name, "waiting", None, None, 1))
+        >>> print(queue.pop())
+        ann waiting
+        >>> print(queue.peek())
+        bob waiting
+        """
+        return self._items.popitem(last=False)[1]
+
+    def discard(self, item):
+        """Remove <item> from this IndexedQueue, if it is there.
+
+        @type self: IndexedQueue
+        @type item: object
+        @rtype: None
+
+        >>> from rider import Rider
+        >>> queue = IndexedQueue()
+        >>> ann, bob = Rider("ann", "waiting", None, None, 1), Rider("bob", "waiting", None, None, 1)
+        >>> queue.append(ann)
+        >>> queue.append(bob)
+        >>> queue.discard(ann)
+        >>> queue.discard(ann)
+        >>> [str(rider) for rider in queue]
+        ['bob waiting']
+        """
+        if item in self:
+            del self._items[item.id]
+
+
 class PriorityQueue(Container):
     """A queue of items that operates in priority order.
 
@@ -47,12 +226,19 @@ class PriorityQueue(Container):
     """
 
     # === Private Attributes ===
-    # @type _items: list
-    #     The items stored in the priority queue.
+    # @type _items: list[(object, int, Handle)]
+    #     The items stored in the priority queue, each paired with the
+    #     sequence number it was inserted with and its handle.
+    # @type _count: int
+    #     The sequence number to give the next inserted item.
     #
     # === Representation Invariants ===
-    # _items is a sorted list, where the first item in the queue is the
-    # item with the highest priority.
+    # _items is a binary heap (see the heapq module), so _items[0] holds the
+    # item with the highest priority. Sequence numbers are unique and
+    # increase with insertion order, so two items of equal priority are
+    # ordered by their sequence numbers, which keeps ties in FIFO order.
+    # Items whose handle is cancelled stay in _items until they reach the
+    # top of the heap, where they are discarded.
 
     def __init__(self):
         """Initialize an empty PriorityQueue.
@@ -61,6 +247,7 @@ class PriorityQueue(Container):
         @rtype: None
         """
         self._items = []
+        self._count = 0
 
     def remove(self):
         """Remove and return the next item from this PriorityQueue.
@@ -71,10 +258,7 @@ class PriorityQueue(Container):
         @rtype: object
 
         >>> pq = PriorityQueue()
-        >>> pq.add("red")
-        >>> pq.add("blue")
-        >>> pq.add("yellow")
-        >>> pq.add("green")
+        >>> pq.add_all(["red", "blue", "yellow", "green"])
         >>> pq.remove()
         'blue'
         >>> pq.remove()
@@ -84,7 +268,30 @@ class PriorityQueue(Container):
         >>> pq.remove()
         'yellow'
         """
-        return self._items.pop(0)
+        while True:
+            handle = heappop(self._items)[2]
+            if not handle.cancelled:
+                return handle.item
+
+    def peek(self):
+        """Return the next item in this PriorityQueue without removing it.
+
+        Precondition: <self> should not be empty.
+
+        @type self: PriorityQueue
+        @rtype: object
+
+        >>> pq = PriorityQueue()
+        >>> pq.add_all(["red", "blue"])
+        >>> pq.peek()
+        'blue'
+        >>> pq.remove()
+        'blue'
+        """
+        items = self._items
+        while items[0][2].cancelled:
+            heappop(items)
+        return items[0][0]
 
     def is_empty(self):
         """
@@ -96,27 +303,272 @@ class PriorityQueue(Container):
         >>> pq = PriorityQueue()
         >>> pq.is_empty()
         True
-        >>> pq.add("thing")
+        >>> handle = pq.add("thing")
         >>> pq.is_empty()
         False
         """
-        return len(self._items) == 0
+        items = self._items
+        while items and items[0][2].cancelled:
+            heappop(items)
+        return len(items) == 0
 
     def add(self, item):
         """Add <item> to this PriorityQueue.
 
+        Return a Handle that can be used to withdraw <item> before it is
+        removed.
+
         @type self: PriorityQueue
         @type item: object
+        @rtype: Handle
+
+        >>> pq = PriorityQueue()
+        >>> yellow = pq.add("yellow")
+        >>> blue = pq.add("blue")
+        >>> red = pq.add("red")
+        >>> green = pq.add("green")
+        >>> green.cancel()
+        >>> [pq.remove() for _ in range(3)]
+        ['blue', 'red', 'yellow']
+        """
+        handle = Handle(item)
+        heappush(self._items, (item, self._count, handle))
+        self._count += 1
+        return handle
+
+    def add_all(self, items):
+        """Add every item in <items> to this PriorityQueue.
+
+        Items that tie in priority are removed in the order they appear in
+        <items>, after any equal items that were already in the queue. When
+        the queue starts out empty this takes linear time.
+
+        @type self: PriorityQueue
+        @type items: iterable[object]
         @rtype: None
 
+        >>> from event import Event
         >>> pq = PriorityQueue()
-        >>> pq.add("yellow")
-        >>> pq.add("blue")
-        >>> pq.add("red")
-        >>> pq.add("green")
-        >>> pq._items
-        ['blue', 'green', 'red', 'yellow']
-        """
-        # TODO
-        self._items.append(item)#adds the new event
-        self._items.sort()#Then sorts them using the built in method
+        >>> first, second, third = Event(3), Event(1), Event(3)
+        >>> pq.add_all([first, second, third])
+        >>> pq.remove() is second
+        True
+        >>> pq.remove() is first
+        True
+        >>> pq.remove() is third
+        True
+        """
+        entries = [(item, self._count + i, Handle(item))
+                   for i, item in enumerate(items)]
+        self._count += len(entries)
+        self._items.extend(entries)
+        heapify(self._items)
+
+
+class TimingWheel(Container):
+    """A queue of timestamped items that operates in timestamp order.
+
+    Items are removed in order of their timestamp attribute, the item with the
+    smallest timestamp first. Ties are resolved in FIFO order, just like in a
+    PriorityQueue of Events.
+
+    Pending items are spread over a ring of buckets, one per time unit, so
+    adding and removing an item take amortized constant time. Items that are
+    due <span> or more time units after the current time wait in an overflow
+    heap until the wheel has turned close enough to them.
+
+    All items in the container must have an integer timestamp attribute,
+    and an item may not be added with a timestamp earlier than that of the
+    last item removed.
+    """
+
+    # === Private Attributes ===
+    # @type _span: int
+    #     The number of buckets in the wheel.
+    # @type _buckets: list[deque[Handle]]
+    #     The handles of the items due at timestamp t are in
+    #     _buckets[t % _span], in the order the items were added.
+    # @type _now: int
+    #     The timestamp of the last item removed, and of the bucket under the
+    #     cursor of the wheel.
+    # @type _hint: int
+    #     No bucket before this timestamp holds an item that is not cancelled.
+    # @type _size: int
+    #     The number of handles in _buckets.
+    # @type _overflow: list[(int, int, Handle)]
+    #     A heap of (timestamp, sequence number, handle) for the items that
+    #     are due too far in the future to be in a bucket.
+    # @type _count: int
+    #     The sequence number to give the next item put in _overflow.
+    #
+    # === Representation Invariants ===
+    # Every item in _buckets has _now <= timestamp < _now + _span.
+    # Every item in _overflow has timestamp >= _now + _span.
+
+    def __init__(self, span=4096):
+        """Initialize an empty TimingWheel with <span> buckets.
+
+        @type self: TimingWheel
+        @type span: int
+            Precondition: span > 0
+        @rtype: None
+        """
+        self._span = span
+        self._buckets = [deque() for _ in range(span)]
+        self._now = 0
+        self._hint = 0
+        self._size = 0
+        self._overflow = []
+        self._count = 0
+
+    def add(self, item):
+        """Add <item> to this TimingWheel.
+
+        Return a Handle that can be used to withdraw <item> before it is
+        removed. Raise ValueError if <item> is due before the last item
+        removed.
+
+        @type self: TimingWheel
+        @type item: object
+        @rtype: Handle
+
+        >>> from event import Event
+        >>> wheel = TimingWheel(4)
+        >>> later = wheel.add(Event(9))
+        >>> sooner = wheel.add(Event(2))
+        >>> wheel.remove().timestamp
+        2
+        >>> wheel.add(Event(1))
+        Traceback (most recent call last):
+        ...
+        ValueError: cannot add an item due at 1 after time 2
+        """
+        timestamp = item.timestamp
+        if timestamp < self._now:
+            raise ValueError("cannot add an item due at {} after time {}"
+                             .format(timestamp, self._now))
+        handle = Handle(item)
+        if timestamp < self._now + self._span:
+            self._buckets[timestamp % self._span].append(handle)
+            self._size += 1
+            if timestamp < self._hint:
+                self._hint = timestamp
+        else:
+            heappush(self._overflow, (timestamp, self._count, handle))
+            self._count += 1
+        return handle
+
+    def remove(self):
+        """Remove and return the next item from this TimingWheel.
+
+        Precondition: <self> should not be empty.
+
+        @type self: TimingWheel
+        @rtype: object
+
+        >>> from event import Event
+        >>> wheel = TimingWheel(4)
+        >>> first, second, third = Event(6), Event(0), Event(6)
+        >>> wheel.add_all([first, second, third])
+        >>> wheel.remove() is second
+        True
+        >>> wheel.remove() is first
+        True
+        >>> wheel.remove() is third
+        True
+        """
+        timestamp, bucket = self._next()
+        if timestamp > self._now:
+            self._now = timestamp
+            self._refill()
+        if bucket is None:
+            bucket = self._buckets[timestamp % self._span]
+        self._size -= 1
+        return bucket.popleft().item
+
+    def peek(self):
+        """Return the next item in this TimingWheel without removing it.
+
+        Precondition: <self> should not be empty.
+
+        @type self: TimingWheel
+        @rtype: object
+
+        >>> from event import Event
+        >>> wheel = TimingWheel(4)
+        >>> wheel.add_all([Event(9), Event(2)])
+        >>> wheel.peek().timestamp
+        2
+        >>> wheel.peek() is wheel.remove()
+        True
+        """
+        timestamp, bucket = self._next()
+        if bucket is None:
+            return self._overflow[0][2].item
+        return bucket[0].item
+
+    def is_empty(self):
+        """Return True iff this TimingWheel is empty.
+
+        @type self: TimingWheel
+        @rtype: bool
+
+        >>> from event import Event
+        >>> wheel = TimingWheel()
+        >>> wheel.is_empty()
+        True
+        >>> handle = wheel.add(Event(100000))
+        >>> wheel.is_empty()
+        False
+        >>> handle.cancel()
+        >>> wheel.is_empty()
+        True
+        """
+        return self._next() is None
+
+    def _next(self):
+        """Return the timestamp of the next item in this TimingWheel, along
+        with the bucket that holds it, or None if the wheel is empty.
+
+        The bucket is None if the next item is still in the overflow heap.
+        Cancelled items passed over on the way are discarded, but the wheel
+        is not turned.
+
+        @type self: TimingWheel
+        @rtype: (int, deque[Handle] | None) | None
+        """
+        if self._size:
+            timestamp = max(self._hint, self._now)
+            horizon = self._now + self._span
+            while timestamp < horizon:
+                bucket = self._buckets[timestamp % self._span]
+                while bucket and bucket[0].cancelled:
+                    bucket.popleft()
+                    self._size -= 1
+                if bucket:
+                    self._hint = timestamp
+                    return timestamp, bucket
+                timestamp += 1
+            self._hint = horizon
+        overflow = self._overflow
+        while overflow and overflow[0][2].cancelled:
+            heappop(overflow)
+        if overflow:
+            return overflow[0][0], None
+        return None
+
+    def _refill(self):
+        """Move the overflow items that are now within reach into buckets.
+
+        Overflow items leave the heap in (timestamp, insertion) order, and
+        no item due at their timestamp could have been put in a bucket yet,
+        so FIFO order among equal timestamps is kept.
+
+        @type self: TimingWheel
+        @rtype: None
+        """
+        horizon = self._now + self._span
+        while self._overflow and self._overflow[0][0] < horizon:
+            timestamp, _, handle = heappop(self._overflow)
+            self._buckets[timestamp % self._span].append(handle)
+            self._size += 1
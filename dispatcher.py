@@ -1,6 +1,15 @@
+from container import IndexedQueue
 from driver import Driver
-from rider import Rider
-from location import Location #imported for doctesting
+from fleet import FleetState
+from grid import DriverGrid, RiderPool
+from rider import Rider, CANCELLED, SATISFIED
+from location import Location, manhattan_distance #Location imported for doctesting
+from monitor import Monitor, RIDER, CANCEL #Monitor imported for doctesting
+
+try:
+    import numpy
+except ImportError:  # NumPy is only needed for batch dispatch
+    numpy = None
 
 
 class Dispatcher:
@@ -17,18 +26,35 @@ class Dispatcher:
     the dispatcher does nothing. Once a driver requests a rider, the driver
     is registered with the dispatcher, and will be used to fulfill future
     rider requests.
+
+    With a rider pool, the waiting list is a RiderPool instead: a driver is
+    assigned the waiting rider nearest to them rather than the first, and
+    riders run out of patience by the deadlines kept in the pool rather
+    than by Cancellation events.
+
+    Drivers move on an open grid, where they drive the Manhattan distance
+    between two locations, unless the dispatcher is given another travel
+    model, such as the distance method of a roads.RoadNetwork. The events of
+    a simulation time every drive with the travel model of its dispatcher.
     """
 
-    def __init__(self):
-        """Initialize a Dispatcher.
+    def __init__(self, rider_pool=False, travel=manhattan_distance):
+        """Initialize a Dispatcher, with a rider pool if <rider_pool> is True.
 
         @type self: Dispatcher
+        @type rider_pool: bool
+        @type travel: callable
+            The distance driven from one location to another, which is never
+            shorter than the Manhattan distance.
         @rtype: None
         """
         # TODO
-        self.driverFleet = []#initializes a new list of drivers
-        self.availableDriver = []#Initializes a new list of unoccupied drivers
-        self.waitingList = []#List of waiting customers
+        self.travel = travel#The distance driven from one location to another
+        self.driverFleet = {}#Registered drivers, by id
+        self.availableDriver = DriverGrid(travel=travel)#Unoccupied drivers, indexed by location
+        self.waitingList = RiderPool(travel=travel) if rider_pool else IndexedQueue()#Queue of waiting customers, indexed by id
+        self.riderPool = self.waitingList if rider_pool else None#The waiting list, if it is a RiderPool
+        self.fleetState = FleetState(travel)#Array mirror of every driver's location, speed and availability
 
 
 
@@ -81,20 +107,103 @@ class Dispatcher:
         None
         """
         # TODO
-        if self.availableDriver == []:#If there are no avialble drivers then add the rider to the waiting list and return None
+        if len(self.availableDriver) == 0:#If there are no avialble drivers then add the rider to the waiting list and return None
             self.waitingList.append(rider)
             return None
-        else:#Else assign the rider to a driver by returning a driver
-            nearestDriver = self.availableDriver[0]
-            #Checking for which driver is closest to the rider.
-            for driver in self.availableDriver:
-                if driver.get_travel_time(rider.location) < nearestDriver.get_travel_time(rider.location):
-                    nearestDriver = driver
-        return nearestDriver
+        #Else assign the rider to the driver closest to them, the first one made available on ties.
+        return self.availableDriver.nearest(rider.location)
+
+    def request_drivers(self, riders, greedy=True):
+        """Return a list with a driver for each rider in riders, or None for
+        a rider if no driver is left for them.
+
+        Riders that get no driver are added to the waiting list. No driver is
+        given to more than one rider, but, just as with request_driver, the
+        drivers stay available until they are deactivated.
+
+        The travel times from every available driver to every rider are
+        computed at once with NumPy, from the arrays in fleetState, or one
+        pair at a time with a travel model other than the Manhattan distance.
+        If greedy is True, the riders are served in order, each taking the
+        nearest driver left, which gives the same drivers as calling
+        request_driver and deActivateDriver for each rider in turn. Otherwise
+        the closest rider and driver pairs are matched first, whatever the
+        order of the riders.
+
+        @type self: Dispatcher
+        @type riders: list[Rider]
+        @type greedy: bool
+        @rtype: list[Driver | None]
+        >>> dispatch = Dispatcher()
+        >>> dispatch.activateDriver(Driver("near",Location(1,1),1))
+        >>> dispatch.activateDriver(Driver("far",Location(9,9),1))
+        >>> ann = Rider("ann","waiting",Location(1,1),Location(8,8),10)
+        >>> bob = Rider("bob","waiting",Location(1,1),Location(1,2),10)
+        >>> [driver.id for driver in dispatch.request_drivers([ann, bob])]
+        ['far', 'near']
+        >>> [driver.id for driver in dispatch.request_drivers([ann, bob], greedy=False)]
+        ['far', 'near']
+        >>> print(dispatch.request_drivers([ann, bob, Rider("cat","waiting",Location(1,1),Location(2,2),10)])[2])
+        None
+        >>> print(len(dispatch.waitingList))
+        1
+        """
+        drivers, slots = self.fleetState.idle_drivers()
+        assigned = [None] * len(riders)
+        if drivers and riders:
+            times = self._travel_times(riders, drivers, slots)
+            if greedy:
+                # The lowest index wins a tie, which is the driver that was
+                # made available first.
+                unused = numpy.iinfo(times.dtype).max
+                for i in range(min(len(riders), len(drivers))):
+                    j = int(times[i].argmin())
+                    assigned[i] = drivers[j]
+                    times[:, j] = unused
+            else:
+                matched = numpy.zeros(len(drivers), dtype=bool)
+                left = min(len(riders), len(drivers))
+                for pair in numpy.argsort(times, axis=None, kind="stable"):
+                    i, j = divmod(int(pair), len(drivers))
+                    if assigned[i] is None and not matched[j]:
+                        assigned[i] = drivers[j]
+                        matched[j] = True
+                        left -= 1
+                        if left == 0:
+                            break
+        for rider, driver in zip(riders, assigned):
+            if driver is None:
+                self.waitingList.append(rider)
+        return assigned
+
+    def _travel_times(self, riders, drivers, slots):
+        """Return the matrix of travel times from each of the drivers in
+        slots of fleetState (columns) to each of riders (rows), as
+        Driver.get_travel_time computes them with the travel model of this
+        dispatcher.
+
+        @type self: Dispatcher
+        @type riders: list[Rider]
+        @type drivers: list[Driver]
+            The drivers in slots.
+        @type slots: numpy.ndarray
+        @rtype: numpy.ndarray
+        """
+        if self.travel is not manhattan_distance:#Drivers on roads.RoadNetwork are timed one pair at a time
+            return numpy.array([[driver.get_travel_time(rider.location, self.travel) for driver in drivers]
+                                for rider in riders], dtype=numpy.int64).reshape(len(riders), len(drivers))
+        rider_rows = numpy.array([rider.location.row for rider in riders], dtype=numpy.int64)
+        rider_columns = numpy.array([rider.location.column for rider in riders], dtype=numpy.int64)
+        driver_rows, driver_columns, speeds = self.fleetState.positions(slots)
+        distances = (numpy.abs(rider_rows[:, None] - driver_rows[None, :])
+                     + numpy.abs(rider_columns[:, None] - driver_columns[None, :]))
+        return distances // speeds[None, :]
 
 
     def request_rider(self, driver):
         """Return a rider for the driver, or None if no rider is available.
+        The rider is the first on the waiting list, or the nearest one if
+        this dispatcher has a rider pool.
 
         If this is a new driver, register the driver for future rider requests.
 
@@ -102,21 +211,65 @@ class Dispatcher:
         @type driver: Driver
         @rtype: Rider | None
         >>> dispatch = Dispatcher()
-        >>> dispatch.waitingList = ["jack"]
-        >>> print(dispatch.request_rider("John"))
-        jack
+        >>> dispatch.waitingList.append(Rider("jack","waiting",Location(5,6),Location(20,5),100))
+        >>> print(dispatch.request_rider(Driver("John",Location(5,10),4)))
+        jack waiting
         >>> dispatch2 = Dispatcher()
-        >>> print(dispatch2.request_rider("John"))
+        >>> print(dispatch2.request_rider(Driver("John",Location(5,10),4)))
         None
+        >>> dispatch3 = Dispatcher(rider_pool=True)
+        >>> dispatch3.waitingList.append(Rider("far","waiting",Location(5,6),Location(20,5),100))
+        >>> dispatch3.waitingList.append(Rider("near","waiting",Location(5,6),Location(5,9),100))
+        >>> print(dispatch3.request_rider(Driver("John",Location(5,10),4)))
+        near waiting
         """
         # TODO
-        if driver not in self.driverFleet:#If isnt already in the list append them to the genral list and the available list
-            self.driverFleet.append(driver)
+        if driver.id not in self.driverFleet:#If isnt already registered add them to the fleet and the available drivers
+            self.driverFleet[driver.id] = driver
             self.availableDriver.append(driver)
-        if self.waitingList == []:#If there are no riders return None
+            self.fleetState.set_idle(driver, True)
+        if len(self.waitingList) == 0:#If there are no riders return None
             return None
+        elif self.riderPool is not None:#With a rider pool the nearest rider is assigned
+            return self.riderPool.nearest(driver.location)
         else:
-            return self.waitingList[0]#If there is a rider then use then assign the first person in the queue
+            return self.waitingList.peek()#If there is a rider then use then assign the first person in the queue
+
+    def register_drivers(self, items):
+        """Register every new driver in items for future rider requests.
+
+        Items may be drivers or events, such as the list create_event_list
+        returns: the driver of each DriverRequest is registered, and other
+        events are skipped. The drivers become available in the order given,
+        just as if each had made its first request, but no waiting riders
+        are assigned to them.
+
+        @type self: Dispatcher
+        @type items: iterable[Driver | Event]
+        @rtype: None
+        >>> from event import create_event_list
+        >>> dispatch = Dispatcher()
+        >>> dispatch.register_drivers(create_event_list("events.txt"))
+        >>> print(dispatch)
+        Amount of Drivers: 6
+        Amount of available Drivers: 6
+        Amount of passengers: 0
+        >>> dispatch.register_drivers([Driver("John",Location(5,10),4)])
+        >>> print(len(dispatch.driverFleet))
+        7
+        """
+        from event import DriverRequest  # event imports this module
+        for item in items:
+            if isinstance(item, DriverRequest):
+                driver = item.driver
+            elif isinstance(item, Driver):
+                driver = item
+            else:
+                continue
+            if driver.id not in self.driverFleet:
+                self.driverFleet[driver.id] = driver
+                self.availableDriver.append(driver)
+                self.fleetState.set_idle(driver, True)
 
     def activateDriver(self,driver):
         '''Makes driver available for pickups.
@@ -127,12 +280,15 @@ class Dispatcher:
         >>> dispatch = Dispatcher()
         >>> driver = Driver("John",Location(5,10),4)
         >>> dispatch.activateDriver(driver)
-        >>> print(dispatch.availableDriver[0].id)
-        John
+        >>> print([driver.id for driver in dispatch.availableDriver])
+        ['John']
         '''
         #TODO
 
+        if driver.location is None:#A driver with no location cannot be found for a rider, so it is not made available
+            return
         self.availableDriver.append(driver)#Makes driver available for pickup by appending them to the list
+        self.fleetState.set_idle(driver, True)
 
     def deActivateDriver(self,driver):
         '''Makes driver unavailable for pickups.
@@ -144,12 +300,78 @@ class Dispatcher:
         >>> driver1 = Driver("John",Location(5,10),4)
         >>> dispatch.activateDriver(driver1)
         >>> dispatch.deActivateDriver(driver1)
-        >>> print(dispatch.availableDriver)
-        []
+        >>> print(len(dispatch.availableDriver))
+        0
         '''
         #TODO
 
         self.availableDriver.remove(driver)#Driver is removed from list to make them unavailable
+        self.fleetState.set_idle(driver, False)
+
+    def relocateDriver(self,driver):
+        '''Records that driver has moved to a new location.
+
+        @type self: Dispatcher
+        @type driver: Driver
+        @rtype: None
+        >>> dispatch = Dispatcher()
+        >>> driver = Driver("John",Location(5,10),4)
+        >>> dispatch.activateDriver(driver)
+        >>> driver.location = Location(1,1)
+        >>> dispatch.relocateDriver(driver)
+        >>> rider = Rider("rider","waiting",Location(5,15),Location(1,2),100)
+        >>> print(dispatch.request_driver(rider))
+        Driver: John, located at 1,1
+
+        A driver whose drive ended without a destination has no location,
+        so nothing is recorded for it, and it is not made available until
+        it has one.
+
+        >>> lost = Driver("Lost",Location(2,2),1)
+        >>> lost.end_drive()
+        >>> print(lost.location)
+        None
+        >>> dispatch.relocateDriver(lost)
+        >>> dispatch.activateDriver(lost)
+        >>> print([driver.id for driver in dispatch.availableDriver])
+        ['John']
+        '''
+        if driver.location is None:#A drive ended without a destination, so there is no location to record
+            return
+        self.availableDriver.update(driver)#Only available drivers are indexed by location
+        self.fleetState.update(driver)
+
+    def expire_riders(self, monitor, timestamp=None, step=0):
+        """Cancel every waiting rider whose patience ran out before an event
+        at <timestamp>, scheduled during step <step> of the rider pool, or
+        every rider with a deadline if <timestamp> is None, and begin the
+        step of that event.
+
+        This takes the place of Cancellation events for a dispatcher with a
+        rider pool: it is called before each event is done, and once at the
+        end of the simulation. Each rider cancels at their deadline, in the
+        same order as their Cancellation event would have been done.
+
+        @type self: Dispatcher
+        @type monitor: Monitor
+        @type timestamp: int | None
+        @type step: int
+            The step during which the event was scheduled, or 0 for an
+            initial event.
+        @rtype: None
+        >>> from event import parse_event
+        >>> from simulation import Simulation
+        >>> tie = ["0 RiderRequest A 1,1 3,3 5", "2 DriverRequest D 1,4 1"]
+        >>> Simulation().run([parse_event(line) for line in tie])
+        {'rider_wait_time': 5.0, 'driver_total_distance': 3.0, 'driver_ride_distance': 0.0}
+        >>> Simulation(dispatcher=Dispatcher(rider_pool=True)).run([parse_event(line) for line in tie])
+        {'rider_wait_time': 5.0, 'driver_total_distance': 3.0, 'driver_ride_distance': 0.0}
+        """
+        for deadline, rider in self.riderPool.expire(timestamp, step):
+            if rider.status != SATISFIED:#A rider that was picked up can no longer cancel
+                monitor.notify(deadline, RIDER, CANCEL, rider.id, rider.location)
+                self.cancel_ride(rider)
+                rider.updateStatus(CANCELLED)
 
     def cancel_ride(self, rider):
         """Cancel the ride for rider.
@@ -161,10 +383,9 @@ class Dispatcher:
         >>> rider1 = Rider("rider","waiting",Location(5,15),Location(20,5),100)
         >>> dispatch.request_driver(rider1)
         >>> dispatch.cancel_ride(rider1)
-        >>> print(dispatch.waitingList)
-        []
+        >>> print(len(dispatch.waitingList))
+        0
         """
         # TODO
-        if rider in self.waitingList:
-            self.waitingList.remove(rider)#when rider cancels they are removed from the waiting list
+        self.waitingList.discard(rider)#when rider cancels they are removed from the waiting list
 
@@ -14,6 +14,8 @@ class Driver:
         A property that is True if the driver is idle and False otherwise.
     """
 
+    __slots__ = ("id", "location", "speed", "destination")
+
     def __init__(self, identifier, location, speed):
         """Initialize a Driver.
 
@@ -58,12 +60,18 @@ class Driver:
         return self.location == other.location and self.id == other.id and self.destination == other.destination \
                and self.speed == other.speed
 
-    def get_travel_time(self, destination):
+    def get_travel_time(self, destination, travel=manhattan_distance):
         """Return the time it will take to arrive at the destination,
         rounded to the nearest integer.
 
+        The distance driven is given by <travel>, which is the Manhattan
+        distance on an open grid unless another travel model, such as the
+        distance method of a roads.RoadNetwork, is given.
+
         @type self: Driver
         @type destination: Location
+        @type travel: callable
+            The distance driven from one location to another.
         @rtype: int
         >>> driver1 = Driver("driver1",Location(5,10), 10)
         >>> driver1.location = Location(5,6)
@@ -73,13 +81,15 @@ class Driver:
         2
         """
         # TODO
-        return manhattan_distance(self.location,destination) // self.speed
+        return travel(self.location,destination) // self.speed
 
-    def start_drive(self, location):
+    def start_drive(self, location, travel=manhattan_distance):
         """Start driving to the location and return the time the drive will take.
 
         @type self: Driver
         @type location: Location
+        @type travel: callable
+            The distance driven from one location to another.
         @rtype: int
         >>> driver1 = Driver("driver1",Location(5,10), 10)
         >>> location = Location(4,8)
@@ -90,7 +100,7 @@ class Driver:
         """
         # TODO
         self.destination = location
-        return manhattan_distance(self.location,self.destination) // self.speed
+        return travel(self.location,self.destination) // self.speed
 
     def end_drive(self):
         """End the drive and arrive at the destination.
@@ -110,11 +120,13 @@ class Driver:
         #not sure if complete
         self.location = self.destination
 
-    def start_ride(self, rider):
+    def start_ride(self, rider, travel=manhattan_distance):
         """Start a ride and return the time the ride will take.
 
         @type self: Driver
         @type rider: Rider
+        @type travel: callable
+            The distance driven from one location to another.
         @rtype: int
 
         >>> driver = Driver("driver",Location(5,10), 10)
@@ -126,7 +138,7 @@ class Driver:
         """
         # TODO
         self.destination = rider.destination
-        return manhattan_distance(self.location,rider.destination) // self.speed
+        return travel(self.location,rider.destination) // self.speed
 
 
     def end_ride(self):
@@ -23,8 +23,12 @@ class Event:
     === Attributes ===
     @type timestamp: int
         A timestamp for this event.
+    @type handle: Handle | None
+        The handle of this event in the event queue, once it is scheduled.
     """
 
+    __slots__ = ("timestamp", "handle")
+
     def __init__(self, timestamp):
         """Initialize an Event with a given timestamp.
 
@@ -38,6 +42,26 @@ class Event:
         7
         """
         self.timestamp = timestamp
+        self.handle = None
+
+    def cancel(self):
+        """Withdraw this event from the event queue, so that it never happens.
+
+        Cancelling an event that is not scheduled has no effect.
+
+        @type self: Event
+        @rtype: None
+
+        >>> from container import PriorityQueue
+        >>> events = PriorityQueue()
+        >>> event = Event(7)
+        >>> event.handle = events.add(event)
+        >>> event.cancel()
+        >>> events.is_empty()
+        True
+        """
+        if self.handle is not None:
+            self.handle.cancel()
 
     # The following six 'magic methods' are overridden to allow for easy
     # comparison of Event instances. All comparisons simply perform the
@@ -154,7 +178,7 @@ class Event:
         """
         raise NotImplementedError("Implemented in a subclass")
 
-    def do(self, dispatcher, monitor):
+    def do(self, dispatcher, monitor, sink=None):
         """Do this Event.
 
         Update the state of the simulation, using the dispatcher, and any
@@ -164,7 +188,9 @@ class Event:
         event.
 
         Return a list of new events spawned by this event (making sure the
-        timestamps are correct).
+        timestamps are correct). If <sink> is not None, each new event is
+        instead made and scheduled by calling sink(cls, timestamp, *args),
+        which returns the event, and None is returned.
 
         Note: the "business logic" of what actually happens should not be
         handled in any Event classes.
@@ -172,10 +198,29 @@ class Event:
         @type self: Event
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    @staticmethod
+    def _spawn(events, sink, cls, timestamp, *args):
+        """Return a new event of class <cls> at <timestamp>, built from
+        <args>, after appending it to <events>, or giving it to <sink> if
+        <sink> is not None.
+
+        @type events: list[Event] | None
+        @type sink: callable | None
+        @type cls: type
+        @type timestamp: int
+        @rtype: Event
+        """
+        if sink is not None:
+            return sink(cls, timestamp, *args)
+        event = cls(timestamp, *args)
+        events.append(event)
+        return event
+
 
 class RiderRequest(Event):
     """A rider requests a driver.
@@ -185,6 +230,8 @@ class RiderRequest(Event):
         The rider.
     """
 
+    __slots__ = ("rider",)
+
     def __init__(self, timestamp, rider):
         """Initialize a RiderRequest event.
 
@@ -195,29 +242,38 @@ class RiderRequest(Event):
         super().__init__(timestamp)
         self.rider = rider
 
-    def do(self, dispatcher, monitor):
+    def do(self, dispatcher, monitor, sink=None):
         """Assign the rider to a driver or add the rider to a waiting list.
         If the rider is assigned to a driver, the driver starts driving to
         the rider.
 
-        Return a Cancellation event. If the rider is assigned to a driver,
-        also return a Pickup event.
+        Return a Cancellation event, which is also recorded as the rider's
+        pending cancellation. If the rider is assigned to a driver, also return
+        a Pickup event. New events go to <sink> instead, if it is not None;
+        see Event.do. If the dispatcher has a rider pool, the rider's deadline
+        is recorded there instead of returning a Cancellation event.
 
         @type self: RiderRequest
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         """
         monitor.notify(self.timestamp, RIDER, REQUEST,
                        self.rider.id, self.rider.location)
 
-        events = []
+        events = [] if sink is None else None
         driver = dispatcher.request_driver(self.rider)
         if driver is not None:
             dispatcher.deActivateDriver(driver)
-            travel_time = driver.start_drive(self.rider.location)
-            events.append(Pickup(self.timestamp + travel_time, self.rider, driver))
-        events.append(Cancellation(self.timestamp + self.rider.patience, self.rider))
+            travel_time = driver.start_drive(self.rider.location, dispatcher.travel)
+            self._spawn(events, sink, Pickup, self.timestamp + travel_time, self.rider, driver)
+        if dispatcher.riderPool is None:
+            self.rider.cancellation = self._spawn(events, sink, Cancellation,
+                                                  self.timestamp + self.rider.patience,
+                                                  self.rider)
+        else:
+            dispatcher.riderPool.schedule(self.rider, self.timestamp + self.rider.patience)
         return events
 
     def __str__(self):
@@ -237,6 +293,8 @@ class DriverRequest(Event):
         The driver.
     """
 
+    __slots__ = ("driver",)
+
     def __init__(self, timestamp, driver):
         """Initialize a DriverRequest event.
 
@@ -247,16 +305,18 @@ class DriverRequest(Event):
         super().__init__(timestamp)
         self.driver = driver
 
-    def do(self, dispatcher, monitor):
+    def do(self, dispatcher, monitor, sink=None):
         """Register the driver, if this is the first request, and
         assign a rider to the driver, if one is available.
 
-        If a rider is available, return a Pickup event.
+        If a rider is available, return a Pickup event. New events go to
+        <sink> instead, if it is not None; see Event.do.
 
         @type self: DriverRequest
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         >>> dispatch = Dispatcher()
         >>> monitor = Monitor()
         >>> rider1 = Rider("rider","waiting",Location(5,15),Location(20,5),10000)
@@ -278,12 +338,12 @@ class DriverRequest(Event):
         monitor.notify(self.timestamp, DRIVER, REQUEST,
                        self.driver.id, self.driver.location)
         rider = dispatcher.request_rider(self.driver)
-        events = []
+        events = [] if sink is None else None
         #start drive and create pick up event, the pick up event do() creates the drop off event!!
         if rider is not None:#When a driver is requested the driver that takes the shortest time to get
             dispatcher.deActivateDriver(self.driver)#to the rider will get that assignment
-            expectedTravelTime = self.driver.start_drive(rider.location)
-            events.append(Pickup(expectedTravelTime + self.timestamp,rider,self.driver))
+            expectedTravelTime = self.driver.start_drive(rider.location, dispatcher.travel)
+            self._spawn(events, sink, Pickup, expectedTravelTime + self.timestamp, rider, self.driver)
             #print(expectedTravelTime)
         return events
     def __str__(self):
@@ -299,6 +359,8 @@ class DriverRequest(Event):
 
 class Cancellation(Event):
     #TODO
+    __slots__ = ("rider",)
+
     def __init__(self,timestamp,rider):
         """Initialize a Cancellation event.
 
@@ -310,13 +372,16 @@ class Cancellation(Event):
         super().__init__(timestamp)
         self.rider = rider
 
-    def do(self, dispatcher, monitor):
+    def do(self, dispatcher, monitor, sink=None):
         """Carries out the cancellation if driver can not make it in time.
 
+        A cancellation spawns no events; see Event.do for <sink>.
+
         @type self: Cancellation
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         >>> dispatch = Dispatcher()
         >>> monitor = Monitor()
         >>> rider1 = Rider("rider","waiting",Location(5,15),Location(20,5),1)
@@ -328,7 +393,7 @@ class Cancellation(Event):
         >>> print(eventsList)
         []
         """
-        events = []
+        events = [] if sink is None else None
         if self.rider.status != SATISFIED:#Can only be carried out the status of the rider is not SATISFIED
             monitor.notify(self.timestamp, RIDER, CANCEL,self.rider.id,self.rider.location)
             dispatcher.cancel_ride(self.rider)
@@ -350,6 +415,8 @@ class Cancellation(Event):
 
 class Pickup(Event):
     #TODO
+    __slots__ = ("driver", "rider")
+
     def __init__(self,timestamp,rider,driver):
         """Initializes a Pickup event.
 
@@ -362,13 +429,17 @@ class Pickup(Event):
         self.driver = driver
         self.rider = rider
 
-    def do(self,dispatcher,monitor):
+    def do(self,dispatcher,monitor,sink=None):
         """Carries out the Pickup event when it is called.
 
+        New events go to <sink> instead of the returned list, if it is not
+        None; see Event.do.
+
         @type self: Pickup
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         >>> dispatch  = Dispatcher()
         >>> monitor = Monitor()
         >>> driver1 = Driver("driver1",Location(5,10), 10)
@@ -389,17 +460,21 @@ class Pickup(Event):
         15 -- Driver: driver1, located at 20,5: Request a rider
         """
         self.driver.end_drive()
+        dispatcher.relocateDriver(self.driver)
 
-        events = []
+        events = [] if sink is None else None
         if self.rider.status == WAITING:
             monitor.notify(self.timestamp,RIDER,PICKUP,self.rider.id,self.rider.location)
             monitor.notify(self.timestamp,DRIVER,PICKUP,self.driver.id,self.driver.location)#ASKKK!!!
-            expectedRideTime = self.driver.start_ride(self.rider) #def start_ride() ==> self.location = self.destination
+            expectedRideTime = self.driver.start_ride(self.rider, dispatcher.travel) #def start_ride() ==> self.location = self.destination
             self.rider.updateStatus(SATISFIED)
-            events.append(Dropoff(self.timestamp + expectedRideTime,self.driver,self.rider))
+            if self.rider.cancellation is not None:#A satisfied rider can no longer cancel, so drop the pending Cancellation
+                self.rider.cancellation.cancel()
+                self.rider.cancellation = None
+            self._spawn(events, sink, Dropoff, self.timestamp + expectedRideTime, self.driver, self.rider)
         elif self.rider.status == CANCELLED:
             dispatcher.activateDriver(self.driver)
-            events.append(DriverRequest(self.timestamp,self.driver))
+            self._spawn(events, sink, DriverRequest, self.timestamp, self.driver)
             #WHEN IS CANCEL-RIDE CALLED ? (EVENT CLASS)
         return events
     def __str__(self):
@@ -413,6 +488,8 @@ class Pickup(Event):
 
 class Dropoff(Event):
     #TODO
+    __slots__ = ("driver", "rider")
+
     def __init__(self,timestamp,driver,rider):
         """Initializes a Dropoff event..
 
@@ -426,13 +503,17 @@ class Dropoff(Event):
         self.driver = driver
         self.rider = rider
 
-    def do(self,dispatcher,monitor):
+    def do(self,dispatcher,monitor,sink=None):
         """Carries out the dropoff event when the pickup event is called.
 
+        New events go to <sink> instead of the returned list, if it is not
+        None; see Event.do.
+
         @type self: Dropoff
         @type dispatcher: Dispatcher
         @type monitor: Monitor
-        @rtype: list[Event]
+        @type sink: callable | None
+        @rtype: list[Event] | None
         >>> dispatch  = Dispatcher()
         >>> monitor = Monitor()
         >>> driver1 = Driver("driver1",Location(5,10), 10)
@@ -443,13 +524,14 @@ class Dropoff(Event):
         >>> print(eventList[0])
         15 -- Driver: driver1, located at 5,15: Request a rider
         """
-        events = []
+        events = [] if sink is None else None
         self.driver.end_ride()
+        dispatcher.relocateDriver(self.driver)
         monitor.notify(self.timestamp,RIDER,DROPOFF,self.rider.id,self.driver.location)
         #monitor.notify(self.timestamp,DRIVER,DROPOFF,self.rider,self.driver.location)
         dispatcher.activateDriver(self.driver)#makes the driver occupied
         dispatcher.cancel_ride(self.rider)#MAkes the rider cancel the ride
-        events.append(DriverRequest(self.timestamp,self.driver))
+        self._spawn(events, sink, DriverRequest, self.timestamp, self.driver)
 
         return events
     def __str__(self):
@@ -461,6 +543,81 @@ class Dropoff(Event):
         return "{} -- {}: Drop off".format(self.timestamp, self.rider)
 
 
+
+class EventPool:
+    """A pool of events that have been done, kept to be reused for new
+    events of the same class instead of allocating them.
+
+    An event may only be released to the pool once nothing refers to it
+    any more; the simulation releases the events it spawned itself, once
+    they are done.
+    """
+
+    # === Private Attributes ===
+    # @type _free: dict[type, list[Event]]
+    #     The released events of each class, ready for reuse.
+    # @type _limit: int
+    #     The largest number of events of one class kept for reuse.
+
+    def __init__(self, limit=4096):
+        """Initialize an empty EventPool.
+
+        @type self: EventPool
+        @type limit: int
+            The largest number of events of one class kept for reuse.
+        @rtype: None
+        """
+        self._free = {}
+        self._limit = limit
+
+    def make(self, cls, timestamp, *args):
+        """Return an event of class <cls> at <timestamp>, built from <args>
+        as cls(timestamp, *args) would be, reusing a released event if
+        there is one.
+
+        @type self: EventPool
+        @type cls: type
+        @type timestamp: int
+        @rtype: Event
+
+        >>> pool = EventPool()
+        >>> rider = Rider("ann", WAITING, Location(1, 1), Location(2, 2), 5)
+        >>> first = pool.make(Cancellation, 5, rider)
+        >>> pool.release(first)
+        >>> second = pool.make(Cancellation, 9, rider)
+        >>> second is first, second.timestamp, second.rider is rider
+        (True, 9, True)
+        """
+        free = self._free.get(cls)
+        if free:
+            event = free.pop()
+            event.__init__(timestamp, *args)
+            return event
+        return cls(timestamp, *args)
+
+    def release(self, event):
+        """Give <event>, which has been done, back to this pool.
+
+        The event lets go of its drivers and riders, and a rider whose
+        pending cancellation it is lets go of it.
+
+        @type self: EventPool
+        @type event: Event
+        @rtype: None
+        """
+        rider = getattr(event, "rider", None)
+        if rider is not None and rider.cancellation is event:
+            rider.cancellation = None
+        free = self._free.get(type(event))
+        if free is None:
+            free = self._free[type(event)] = []
+        if len(free) < self._limit:
+            for name in type(event).__slots__:
+                setattr(event, name, None)
+            event.handle = None
+            free.append(event)
+
+
 def create_event_list(filename):
     """Return a list of Events based on raw list of events in <filename>.
 
@@ -484,47 +641,99 @@ def create_event_list(filename):
     20 -- Eggshell waiting: Request a driver
     25 -- Fallow waiting: Request a driver
     """
-    events = []
+    return list(iter_events(filename))
+
+
+def iter_events(filename):
+    """Yield the Events in <filename> one at a time, in file order.
+
+    Unlike create_event_list, only one line of the file is held in memory at
+    a time, so this suits files too large to load at once.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    @param filename: str
+        The name of a file that contains the list of events.
+    @rtype: iterator[Event]
+    >>> events = iter_events("events.txt")
+    >>> print(next(events))
+    0 -- Driver: Amaranth, located at 1,1: Request a rider
+    """
     with open(filename, "r") as file:
         for line in file:
-            line = line.strip()
+            event = parse_event(line)
+            if event is not None:
+                yield event
+
+
+def parse_event(line):
+    """Return the Event described by one <line> of an event file, or None if
+    the line holds no event.
+
+    @param line: str
+        A line in the format specified by the assignment handout.
+    @rtype: Event | None
+    >>> print(parse_event("10 RiderRequest Cerise 4,2 1,5 15"))
+    10 -- Cerise waiting: Request a driver
+    >>> print(parse_event("# A comment"))
+    None
+    """
+    line = line.strip()
+
+    if not line or line.startswith("#"):
+        # Skip lines that are blank or start with #.
+        return None
+
+    # Create a list of words in the line, e.g.
+    # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
+    # Note that these are strings, and you'll need to convert some
+    # of them to a different type.
+    tokens = line.split()
+    timestamp = int(tokens[0])
+    event_type = tokens[1]
+
+    # HINT: Use Location.deserialize to convert the location string to
+    # a location.
+    if event_type == "DriverRequest":
+        # Create a DriverRequest event.
+        driverIdentification = tokens[2]
+        driverLocation = deserialize_location(tokens[3])
+        driverSpeed = int(tokens[4])
+        driver = Driver(driverIdentification,driverLocation,driverSpeed)
+        return DriverRequest(timestamp,driver)
+
+    elif event_type == "RiderRequest":
+        # Create a RiderRequest event.
+        riderIdentification = tokens[2]
+        riderLocation= deserialize_location(tokens[3])
+        riderDestination = deserialize_location(tokens[4])
+        riderPatience = int(tokens[5])
+        rider  = Rider(riderIdentification,WAITING,riderDestination,riderLocation,riderPatience)
+        return RiderRequest(timestamp,rider)
+
+    return None
+
+
+def is_time_sorted(filename):
+    """Return True iff the events in <filename> are in timestamp order.
+
+    Only the timestamps are read, one line at a time.
 
+    @param filename: str
+        The name of a file that contains the list of events.
+    @rtype: bool
+    >>> is_time_sorted("events.txt")
+    True
+    """
+    last = None
+    with open(filename, "r") as file:
+        for line in file:
+            line = line.strip()
             if not line or line.startswith("#"):
-                # Skip lines that are blank or start with #.
                 continue
-
-            # Create a list of words in the line, e.g.
-            # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
-            # Note that these are strings, and you'll need to convert some
-            # of them to a different type.
-            tokens = line.split()
-            timestamp = int(tokens[0])
-            event_type = tokens[1]
-
-            # HINT: Use Location.deserialize to convert the location string to
-            # a location.
-            event = []
-            if event_type == "DriverRequest":
-                # TODO
-                # Create a DriverRequest event.
-
-                driverIdentification = tokens[2]
-                driverLocation = deserialize_location(tokens[3])
-                driverSpeed = int(tokens[4])
-                #is that all added to event?
-                driver = Driver(driverIdentification,driverLocation,driverSpeed)
-                events.append(DriverRequest(timestamp,driver))
-
-            elif event_type == "RiderRequest":
-                # TODO
-                # Create a RiderRequest event.
-                riderIdentification = tokens[2]
-                riderLocation= deserialize_location(tokens[3])
-                riderDestination = deserialize_location(tokens[4])
-                riderPatience = int(tokens[5])
-                #is that all added to event?
-                rider  = Rider(riderIdentification,WAITING,riderDestination,riderLocation,riderPatience)
-                events.append(RiderRequest(timestamp,rider))
-
-
-    return events
+            timestamp = int(line.split(None, 1)[0])
+            if last is not None and timestamp < last:
+                return False
+            last = timestamp
+    return True
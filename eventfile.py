@@ -0,0 +1,160 @@
+import mmap
+import struct
+
+from driver import Driver
+from event import DriverRequest, RiderRequest, iter_events
+from location import make_location
+from rider import Rider, WAITING
+
+"""
+The eventfile module reads and writes event lists in a compact binary
+format, which loads much faster than the text format read by
+event.create_event_list.
+
+A binary event file holds a header, then one fixed-width record per event,
+then a table of the driver and rider identifiers used by the records.
+
+=== Constants ===
+@type MAGIC: bytes
+    The bytes every binary event file starts with.
+@type VERSION: int
+    The version of the format written by this module.
+@type HEADER: struct.Struct
+    The layout of the header: the magic bytes, the format version,
+    two bytes of padding, the number of records, and the offset of the
+    identifier table.
+@type RECORD: struct.Struct
+    The layout of a record: the timestamp, the event kind, three bytes of
+    padding, the index of the identifier in the identifier table, the row
+    and column of the driver's location or the rider's origin, the row and
+    column of the rider's destination (0 for drivers), and the driver's
+    speed or the rider's patience.
+@type LENGTH: struct.Struct
+    The layout of the length that precedes each identifier in the table.
+@type DRIVER_REQUEST: int
+    The event kind of a DriverRequest record.
+@type RIDER_REQUEST: int
+    The event kind of a RiderRequest record.
+"""
+
+MAGIC = b"UBEV"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxQQ")
+RECORD = struct.Struct("<qBxxxIiiiii")
+LENGTH = struct.Struct("<I")
+
+DRIVER_REQUEST = 0
+RIDER_REQUEST = 1
+
+
+def convert_event_file(source, target):
+    """Write the events in the text event file <source> to the binary event
+    file <target>, and return the number of events written.
+
+    The text file is read one line at a time.
+
+    @type source: str
+        The name of a file in the format read by event.create_event_list.
+    @type target: str
+        The name of the binary file to write.
+    @rtype: int
+    """
+    identifiers = {}
+    count = 0
+    with open(target, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        for event in iter_events(source):
+            if isinstance(event, DriverRequest):
+                driver = event.driver
+                index = identifiers.setdefault(driver.id, len(identifiers))
+                file.write(RECORD.pack(event.timestamp, DRIVER_REQUEST, index,
+                                       driver.location.row,
+                                       driver.location.column, 0, 0,
+                                       driver.speed))
+            else:
+                rider = event.rider
+                index = identifiers.setdefault(rider.id, len(identifiers))
+                file.write(RECORD.pack(event.timestamp, RIDER_REQUEST, index,
+                                       rider.location.row,
+                                       rider.location.column,
+                                       rider.destination.row,
+                                       rider.destination.column,
+                                       rider.patience))
+            count += 1
+        offset = file.tell()
+        for identifier in identifiers:
+            data = identifier.encode("utf-8")
+            file.write(LENGTH.pack(len(data)))
+            file.write(data)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, count, offset))
+    return count
+
+
+def iter_binary_events(filename):
+    """Yield the Events in the binary event file <filename>, in file order.
+
+    The file is memory-mapped, and each event is built straight from its
+    record, so the file is never copied into memory as a whole. The events
+    are the same, in the same order, as create_event_list gives for the text
+    file the binary file was converted from.
+
+    Raise ValueError if <filename> is not a binary event file.
+
+    @type filename: str
+    @rtype: iterator[Event]
+
+    >>> import os, tempfile
+    >>> from event import create_event_list
+    >>> folder = tempfile.mkdtemp()
+    >>> target = os.path.join(folder, "events.bin")
+    >>> convert_event_file("events.txt", target)
+    12
+    >>> binary = [str(event) for event in iter_binary_events(target)]
+    >>> binary == [str(event) for event in create_event_list("events.txt")]
+    True
+    >>> os.remove(target)
+    >>> os.rmdir(folder)
+    """
+    with open(filename, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            raise ValueError("{} is not a binary event file".format(filename))
+        magic, version, count, offset = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a binary event file".format(filename))
+        identifiers = _read_identifiers(data, offset)
+        view = memoryview(data)
+        try:
+            records = view[HEADER.size:HEADER.size + count * RECORD.size]
+            for (timestamp, kind, index, row, column, destination_row,
+                 destination_column, value) in RECORD.iter_unpack(records):
+                if kind == DRIVER_REQUEST:
+                    driver = Driver(identifiers[index], make_location(row, column),
+                                    value)
+                    yield DriverRequest(timestamp, driver)
+                else:
+                    rider = Rider(identifiers[index], WAITING,
+                                  make_location(destination_row, destination_column),
+                                  make_location(row, column), value)
+                    yield RiderRequest(timestamp, rider)
+        finally:
+            records = None
+            view.release()
+
+
+def _read_identifiers(data, offset):
+    """Return the identifier table that starts at <offset> in <data>.
+
+    @type data: mmap.mmap
+    @type offset: int
+    @rtype: list[str]
+    """
+    identifiers = []
+    end = len(data)
+    while offset < end:
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        identifiers.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return identifiers
@@ -0,0 +1,216 @@
+from array import array
+
+from location import Location, make_location, manhattan_distance #Location imported for doctesting
+from driver import Driver #imported for doctesting
+
+try:
+    import numpy
+except ImportError:  # NumPy is only needed for the fleet-wide queries
+    numpy = None
+
+"""
+The fleet module contains the FleetState class, which mirrors the state of
+every driver in contiguous arrays so that questions about the whole fleet
+can be answered with vectorized NumPy expressions.
+"""
+
+
+class FleetState:
+    """The row, column, speed and idle flag of every driver in a fleet, kept
+    in one typed array per field.
+
+    Each driver gets a slot, its index in the arrays, when first seen. The
+    mirror is kept up to date by the Dispatcher whenever a driver is
+    activated, deactivated or moves. The fleet-wide queries need NumPy.
+    They are vectorized for the Manhattan distance; with another travel
+    model, each driver's distance is found in turn.
+    """
+
+    # === Private Attributes ===
+    # @type _slots: dict[str, int]
+    #     Maps the id of every driver seen to its slot.
+    # @type _drivers: list[Driver]
+    #     The driver in each slot.
+    # @type _row: array[int]
+    #     The row of each driver's location.
+    # @type _column: array[int]
+    #     The column of each driver's location.
+    # @type _speed: array[int]
+    #     The speed of each driver.
+    # @type _idle: array[int]
+    #     1 for each driver that is available for pickups, 0 otherwise.
+    # @type _order: array[int]
+    #     The order in which each idle driver was last made idle.
+    # @type _count: int
+    #     The order to give the next driver made idle.
+    # @type _travel: callable
+    #     The distance driven from one location to another.
+
+    def __init__(self, travel=manhattan_distance):
+        """Initialize a FleetState with no drivers.
+
+        @type self: FleetState
+        @type travel: callable
+            The distance driven from one location to another.
+        @rtype: None
+        """
+        self._travel = travel
+        self._slots = {}
+        self._drivers = []
+        self._row = array("i")
+        self._column = array("i")
+        self._speed = array("i")
+        self._idle = array("b")
+        self._order = array("q")
+        self._count = 0
+
+    def __len__(self):
+        """Return the number of drivers in this FleetState.
+
+        @type self: FleetState
+        @rtype: int
+        """
+        return len(self._drivers)
+
+    def update(self, driver):
+        """Record the current location and speed of <driver>, giving it a
+        slot if it has none yet.
+
+        @type self: FleetState
+        @type driver: Driver
+        @rtype: None
+        """
+        slot = self._slots.get(driver.id)
+        if slot is None:
+            self._slots[driver.id] = len(self._drivers)
+            self._drivers.append(driver)
+            self._row.append(driver.location.row)
+            self._column.append(driver.location.column)
+            self._speed.append(driver.speed)
+            self._idle.append(0)
+            self._order.append(0)
+        else:
+            self._drivers[slot] = driver
+            self._row[slot] = driver.location.row
+            self._column[slot] = driver.location.column
+            self._speed[slot] = driver.speed
+
+    def set_idle(self, driver, idle):
+        """Record the current state of <driver>, and whether it is <idle>.
+
+        @type self: FleetState
+        @type driver: Driver
+        @type idle: bool
+        @rtype: None
+        """
+        self.update(driver)
+        slot = self._slots[driver.id]
+        self._idle[slot] = idle
+        if idle:
+            self._order[slot] = self._count
+            self._count += 1
+
+    def idle_drivers(self):
+        """Return the idle drivers, in the order they were made idle, along
+        with their slots.
+
+        @type self: FleetState
+        @rtype: (list[Driver], numpy.ndarray)
+        """
+        slots = numpy.flatnonzero(numpy.frombuffer(self._idle, dtype=numpy.int8))
+        slots = slots[numpy.argsort(numpy.frombuffer(self._order, dtype=numpy.int64)[slots])]
+        return [self._drivers[slot] for slot in slots.tolist()], slots
+
+    def positions(self, slots):
+        """Return the rows, columns and speeds of the drivers in <slots>.
+
+        @type self: FleetState
+        @type slots: numpy.ndarray
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        return (numpy.frombuffer(self._row, dtype=numpy.int32)[slots].astype(numpy.int64),
+                numpy.frombuffer(self._column, dtype=numpy.int32)[slots].astype(numpy.int64),
+                numpy.frombuffer(self._speed, dtype=numpy.int32)[slots].astype(numpy.int64))
+
+    def travel_times(self, location):
+        """Return the time each driver would take to drive to <location>,
+        indexed by slot, as Driver.get_travel_time computes it.
+
+        @type self: FleetState
+        @type location: Location
+        @rtype: numpy.ndarray
+        >>> fleet = FleetState()
+        >>> fleet.update(Driver("ann", Location(1, 1), 1))
+        >>> fleet.update(Driver("bob", Location(5, 5), 2))
+        >>> fleet.travel_times(Location(1, 3)).tolist()
+        [2, 3]
+        """
+        return self.distances(location) // numpy.frombuffer(self._speed, dtype=numpy.int32)
+
+    def distances(self, location):
+        """Return the distance each driver would drive to <location>,
+        indexed by slot.
+
+        @type self: FleetState
+        @type location: Location
+        @rtype: numpy.ndarray
+        >>> from roads import RoadNetwork
+        >>> fleet = FleetState(RoadNetwork(2, 3, blocked=[Location(0, 1)]).distance)
+        >>> fleet.update(Driver("ann", Location(0, 0), 1))
+        >>> fleet.distances(Location(0, 2)).tolist()
+        [4]
+        """
+        if self._travel is not manhattan_distance:
+            return numpy.array([self._travel(make_location(row, column), location)
+                                for row, column in zip(self._row, self._column)],
+                               dtype=numpy.int64)
+        row = numpy.frombuffer(self._row, dtype=numpy.int32).astype(numpy.int64)
+        column = numpy.frombuffer(self._column, dtype=numpy.int32).astype(numpy.int64)
+        return numpy.abs(row - location.row) + numpy.abs(column - location.column)
+
+    def nearest_idle(self, location):
+        """Return the idle driver with the shortest travel time to
+        <location>, or None if no driver is idle.
+
+        Ties go to the driver that was made idle first, so this is the
+        driver Dispatcher.request_driver would choose.
+
+        @type self: FleetState
+        @type location: Location
+        @rtype: Driver | None
+        >>> fleet = FleetState()
+        >>> fleet.set_idle(Driver("ann", Location(1, 1), 1), True)
+        >>> fleet.set_idle(Driver("bob", Location(1, 5), 1), True)
+        >>> fleet.set_idle(Driver("cat", Location(1, 4), 1), False)
+        >>> print(fleet.nearest_idle(Location(1, 3)))
+        Driver: ann, located at 1,1
+        """
+        idle = numpy.frombuffer(self._idle, dtype=numpy.int8).astype(bool)
+        if not idle.any():
+            return None
+        times = numpy.where(idle, self.travel_times(location), numpy.iinfo(numpy.int64).max)
+        tied = numpy.flatnonzero(times == times.min())
+        order = numpy.frombuffer(self._order, dtype=numpy.int64)
+        return self._drivers[int(tied[order[tied].argmin()])]
+
+    def count_within(self, location, blocks, idle_only=True):
+        """Return the number of drivers at most <blocks> blocks of driving
+        from <location>, counting only idle drivers if <idle_only> is True.
+
+        @type self: FleetState
+        @type location: Location
+        @type blocks: int
+        @type idle_only: bool
+        @rtype: int
+        >>> fleet = FleetState()
+        >>> fleet.set_idle(Driver("ann", Location(1, 1), 1), True)
+        >>> fleet.set_idle(Driver("bob", Location(1, 5), 1), False)
+        >>> fleet.count_within(Location(1, 3), 2, idle_only=False)
+        2
+        >>> fleet.count_within(Location(1, 3), 2)
+        1
+        """
+        near = self.distances(location) <= blocks
+        if idle_only:
+            near &= numpy.frombuffer(self._idle, dtype=numpy.int8).astype(bool)
+        return int(near.sum())
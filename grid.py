@@ -0,0 +1,591 @@
+from heapq import heappop, heappush
+
+from location import Location, manhattan_distance #Location imported for doctesting
+from driver import Driver #imported for doctesting
+from rider import Rider #imported for doctesting
+
+"""
+The grid module contains the DriverGrid class, a spatial index of the
+drivers that are available for pickups, and the RiderPool class, a spatial
+index of the riders that are waiting for one.
+"""
+
+
+class DriverGrid:
+    """The available drivers, filed by location so that the driver nearest
+    to a location can be found without looking at every driver.
+
+    The grid is split into square cells of <size> by <size> locations, and
+    every speed has its own set of cells. To find the nearest driver, the
+    cells of each speed are searched ring by ring outwards from the target,
+    and the search stops as soon as no unsearched cell could hold a driver
+    that arrives sooner than the best one found.
+
+    A DriverGrid can be used like the list of available drivers it replaces:
+    drivers are added with append, taken out with remove, and iterating over
+    it gives the drivers in the order they were appended.
+    """
+
+    # === Private Attributes ===
+    # @type _size: int
+    #     The width and height of a cell.
+    # @type _count: int
+    #     The sequence number to give the next appended driver.
+    # @type _drivers: dict[str, (Driver, int, int, (int, int))]
+    #     Maps the id of every driver in the grid to the driver, its sequence
+    #     number, its speed and the cell it is filed in, in append order.
+    # @type _tiers: dict[int, _Tier]
+    #     The cells for the drivers of each speed.
+    # @type _travel: callable
+    #     The distance driven from one location to another.
+
+    def __init__(self, size=4, travel=manhattan_distance):
+        """Initialize an empty DriverGrid.
+
+        @type self: DriverGrid
+        @type size: int
+            The width and height of a cell. Precondition: size > 0
+        @type travel: callable
+            The distance driven from one location to another, which is never
+            shorter than the Manhattan distance.
+        @rtype: None
+        """
+        self._size = size
+        self._travel = travel
+        self._count = 0
+        self._drivers = {}
+        self._tiers = {}
+
+    def __len__(self):
+        """Return the number of drivers in this grid.
+
+        @type self: DriverGrid
+        @rtype: int
+        """
+        return len(self._drivers)
+
+    def __iter__(self):
+        """Return an iterator over the drivers in this grid, in append order.
+
+        @type self: DriverGrid
+        @rtype: iterator[Driver]
+        """
+        return (entry[0] for entry in list(self._drivers.values()))
+
+    def __contains__(self, driver):
+        """Return True iff <driver> is in this grid.
+
+        @type self: DriverGrid
+        @type driver: Driver
+        @rtype: bool
+        """
+        entry = self._drivers.get(driver.id)
+        return entry is not None and entry[0] is driver
+
+    def append(self, driver):
+        """Add <driver> to this grid, filed under its current location.
+
+        @type self: DriverGrid
+        @type driver: Driver
+        @rtype: None
+
+        >>> grid = DriverGrid()
+        >>> grid.append(Driver("John", Location(5, 10), 4))
+        >>> grid.append(Driver("Paul", Location(1, 1), 2))
+        >>> [driver.id for driver in grid]
+        ['John', 'Paul']
+        """
+        cell = self._cell(driver.location)
+        self._drivers[driver.id] = (driver, self._count, driver.speed, cell)
+        self._count += 1
+        tier = self._tiers.get(driver.speed)
+        if tier is None:
+            tier = self._tiers[driver.speed] = _Tier()
+        tier.add(driver, cell)
+
+    def remove(self, driver):
+        """Remove <driver> from this grid.
+
+        Raise ValueError if <driver> is not in this grid.
+
+        @type self: DriverGrid
+        @type driver: Driver
+        @rtype: None
+
+        >>> grid = DriverGrid()
+        >>> john = Driver("John", Location(5, 10), 4)
+        >>> grid.append(john)
+        >>> grid.remove(john)
+        >>> len(grid)
+        0
+        >>> grid.remove(john)
+        Traceback (most recent call last):
+        ...
+        ValueError: driver John is not in the grid
+        """
+        if driver not in self:
+            raise ValueError("driver {} is not in the grid".format(driver.id))
+        _, _, speed, cell = self._drivers.pop(driver.id)
+        tier = self._tiers[speed]
+        tier.discard(driver, cell)
+        if tier.count == 0:
+            del self._tiers[speed]
+
+    def update(self, driver):
+        """Refile <driver> under its current location, if it is in this grid.
+
+        The driver keeps its place in the append order.
+
+        @type self: DriverGrid
+        @type driver: Driver
+        @rtype: None
+
+        >>> grid = DriverGrid()
+        >>> john = Driver("John", Location(5, 10), 4)
+        >>> grid.append(john)
+        >>> john.location = Location(1, 1)
+        >>> grid.update(john)
+        >>> print(grid.nearest(Location(1, 2)))
+        Driver: John, located at 1,1
+        """
+        if driver not in self:
+            return
+        _, number, speed, cell = self._drivers[driver.id]
+        new_cell = self._cell(driver.location)
+        if new_cell != cell:
+            self._tiers[speed].discard(driver, cell)
+            self._tiers[speed].add(driver, new_cell)
+            self._drivers[driver.id] = (driver, number, speed, new_cell)
+
+    def nearest(self, location):
+        """Return the driver with the shortest travel time to <location>, or
+        None if this grid is empty.
+
+        Ties go to the driver that was appended first, which is the driver a
+        linear scan over the drivers in append order would choose.
+
+        @type self: DriverGrid
+        @type location: Location
+        @rtype: Driver | None
+
+        >>> grid = DriverGrid(2)
+        >>> grid.append(Driver("Slow", Location(1, 1), 1))
+        >>> grid.append(Driver("Fast", Location(9, 9), 16))
+        >>> grid.append(Driver("Late", Location(2, 1), 1))
+        >>> print(grid.nearest(Location(1, 2)))
+        Driver: Fast, located at 9,9
+        >>> print(grid.nearest(Location(1, 1)))
+        Driver: Slow, located at 1,1
+        """
+        best = None
+        best_time = best_number = 0
+        row, column = location.row // self._size, location.column // self._size
+        for speed, tier in self._tiers.items():
+            seen = 0
+            for ring in range(tier.reach(row, column) + 1):
+                # Every location in a cell on this ring, or further out, is
+                # at least this far from <location>. Once every driver of
+                # this speed has been seen, there is nothing further out.
+                distance = (ring - 1) * self._size + 1 if ring else 0
+                if best is not None and distance // speed > best_time \
+                        or seen == tier.count:
+                    break
+                for driver in tier.ring(row, column, ring):
+                    seen += 1
+                    time = driver.get_travel_time(location, self._travel)
+                    if best is None or time <= best_time:
+                        number = self._drivers[driver.id][1]
+                        if best is None or time < best_time \
+                                or number < best_number:
+                            best, best_time, best_number = driver, time, number
+        return best
+
+    def _cell(self, location):
+        """Return the cell that holds <location>.
+
+        @type self: DriverGrid
+        @type location: Location
+        @rtype: (int, int)
+        """
+        return location.row // self._size, location.column // self._size
+
+
+class RiderPool:
+    """The waiting riders, filed by location so that the rider nearest to a
+    location can be found without looking at every rider, along with the
+    time each requested rider runs out of patience.
+
+    The grid is split into square cells of <size> by <size> locations,
+    which are searched ring by ring outwards from the target, as in a
+    DriverGrid, and distances are found with the travel model the pool is
+    given. The deadlines are kept in a heap, so the riders whose
+    patience has run out can be taken out in bulk.
+
+    The pool counts the events of the simulation in steps, so that a
+    deadline falls exactly where the Cancellation event it replaces would
+    have been done: after the events at the same time that were scheduled
+    no later than the step in which the deadline was set, and before the
+    rest.
+
+    A RiderPool can be used like the IndexedQueue of waiting riders it
+    replaces: riders are added with append, taken out with discard or pop,
+    and iterating over it gives the riders in the order they were appended.
+    All riders must have distinct ids.
+
+    === Attributes ===
+    @type step: int
+        The number of the current step: the number of events begun.
+    """
+
+    # === Private Attributes ===
+    # @type _size: int
+    #     The width and height of a cell.
+    # @type _count: int
+    #     The sequence number to give the next appended rider.
+    # @type _riders: dict[str, (Rider, int, (int, int))]
+    #     Maps the id of every rider in the pool to the rider, its sequence
+    #     number and the cell it is filed in, in append order.
+    # @type _cells: _Tier
+    #     The cells for the riders in the pool.
+    # @type _deadlines: list[(int, int, int, Rider)]
+    #     A heap of the deadline, step, sequence number and rider of every
+    #     rider given a deadline that has not been expired.
+    # @type _scheduled: int
+    #     The sequence number to give the next deadline.
+    # @type _travel: callable
+    #     The distance driven from one location to another.
+
+    def __init__(self, size=4, travel=manhattan_distance):
+        """Initialize an empty RiderPool.
+
+        @type self: RiderPool
+        @type size: int
+            The width and height of a cell. Precondition: size > 0
+        @type travel: callable
+            The distance driven from one location to another, which is never
+            shorter than the Manhattan distance.
+        @rtype: None
+        """
+        self._size = size
+        self._travel = travel
+        self._count = 0
+        self._riders = {}
+        self._cells = _Tier()
+        self._deadlines = []
+        self._scheduled = 0
+        self.step = 0
+
+    def __len__(self):
+        """Return the number of riders in this pool.
+
+        @type self: RiderPool
+        @rtype: int
+        """
+        return len(self._riders)
+
+    def __iter__(self):
+        """Return an iterator over the riders in this pool, in append order.
+
+        @type self: RiderPool
+        @rtype: iterator[Rider]
+        """
+        return (entry[0] for entry in list(self._riders.values()))
+
+    def __contains__(self, rider):
+        """Return True iff <rider> is in this pool.
+
+        @type self: RiderPool
+        @type rider: Rider
+        @rtype: bool
+        """
+        entry = self._riders.get(rider.id)
+        return entry is not None and entry[0] is rider
+
+    def append(self, rider):
+        """Add <rider> to this pool, filed under its location.
+
+        @type self: RiderPool
+        @type rider: Rider
+        @rtype: None
+        """
+        cell = rider.location.row // self._size, rider.location.column // self._size
+        self._riders[rider.id] = (rider, self._count, cell)
+        self._count += 1
+        self._cells.add(rider, cell)
+
+    def peek(self):
+        """Return the rider that was appended first.
+
+        Precondition: <self> should not be empty.
+
+        @type self: RiderPool
+        @rtype: Rider
+        """
+        return next(iter(self._riders.values()))[0]
+
+    def pop(self):
+        """Remove and return the rider that was appended first.
+
+        Precondition: <self> should not be empty.
+
+        @type self: RiderPool
+        @rtype: Rider
+        """
+        rider = self.peek()
+        self.discard(rider)
+        return rider
+
+    def discard(self, rider):
+        """Remove <rider> from this pool, if it is there.
+
+        Its deadline, if it has one, is kept.
+
+        @type self: RiderPool
+        @type rider: Rider
+        @rtype: None
+        """
+        if rider in self:
+            _, _, cell = self._riders.pop(rider.id)
+            self._cells.discard(rider, cell)
+
+    def nearest(self, location):
+        """Return the rider in this pool that a driver at <location> can
+        drive to in the shortest distance, or None if this pool is empty.
+
+        Ties go to the rider that was appended first.
+
+        @type self: RiderPool
+        @type location: Location
+        @rtype: Rider | None
+
+        >>> pool = RiderPool(2)
+        >>> for name, row in [("ann", 9), ("bob", 1), ("cat", 3)]:
+        ...     pool.append(Rider(name, "waiting", None, Location(row, 1), 5))
+        >>> print(pool.nearest(Location(2, 1)))
+        bob waiting
+        >>> print(pool.peek())
+        ann waiting
+        >>> print(RiderPool().nearest(Location(2, 1)))
+        None
+        """
+        if not self._riders:
+            return None
+        best = None
+        best_distance = best_number = 0
+        row, column = location.row // self._size, location.column // self._size
+        cells = self._cells
+        seen = 0
+        for ring in range(cells.reach(row, column) + 1):
+            # Every location in a cell on this ring, or further out, is at
+            # least this far from <location>. Once every rider has been
+            # seen, there is nothing further out.
+            if best is not None and (ring - 1) * self._size + 1 > best_distance \
+                    or seen == cells.count:
+                break
+            for rider in cells.ring(row, column, ring):
+                seen += 1
+                distance = self._travel(location, rider.location)
+                if best is None or distance <= best_distance:
+                    number = self._riders[rider.id][1]
+                    if best is None or distance < best_distance \
+                            or number < best_number:
+                        best, best_distance, best_number = rider, distance, number
+        return best
+
+    def schedule(self, rider, deadline):
+        """Record that <rider> runs out of patience at <deadline>, during the
+        current step, whether or not it is in this pool.
+
+        @type self: RiderPool
+        @type rider: Rider
+        @type deadline: int
+        @rtype: None
+        """
+        heappush(self._deadlines, (deadline, self.step, self._scheduled, rider))
+        self._scheduled += 1
+
+    def expire(self, timestamp=None, step=0):
+        """Forget and return the deadline and rider of every deadline that
+        falls before an event at <timestamp> scheduled during step <step>,
+        in the order they fall, and begin the step of that event. If
+        <timestamp> is None, every deadline is forgotten and returned.
+
+        A deadline falls before the event if it is before <timestamp>, or at
+        <timestamp> and set during a step before <step>. Initial events are
+        scheduled during step 0, before any deadline is set. The riders are
+        not taken out of this pool.
+
+        @type self: RiderPool
+        @type timestamp: int | None
+        @type step: int
+        @rtype: list[(int, Rider)]
+
+        >>> pool = RiderPool()
+        >>> ann = Rider("ann", "waiting", None, Location(1, 1), 5)
+        >>> bob = Rider("bob", "waiting", None, Location(2, 2), 3)
+        >>> pool.expire(0)
+        []
+        >>> pool.schedule(ann, 5)
+        >>> pool.schedule(bob, 3)
+        >>> [(deadline, rider.id) for deadline, rider in pool.expire(5)]
+        [(3, 'bob')]
+        >>> [(deadline, rider.id) for deadline, rider in pool.expire(5, 1)]
+        []
+        >>> [(deadline, rider.id) for deadline, rider in pool.expire(5, 2)]
+        [(5, 'ann')]
+        """
+        deadlines = self._deadlines
+        expired = []
+        while deadlines and (timestamp is None or deadlines[0][0] < timestamp
+                             or (deadlines[0][0] == timestamp
+                                 and deadlines[0][1] < step)):
+            deadline, _, _, rider = heappop(deadlines)
+            expired.append((deadline, rider))
+        if timestamp is not None:
+            self.step += 1
+        return expired
+
+
+class _Tier:
+    """The cells for the drivers of a single speed, or for waiting riders.
+
+    === Attributes ===
+    @type cells: dict[(int, int), dict[str, Driver | Rider]]
+        The drivers or riders in each non-empty cell, by id.
+    @type count: int
+        The number of drivers or riders in the cells.
+    """
+
+    # === Private Attributes ===
+    # @type _bounds: list[int] | None
+    #     The smallest and largest row and column of any cell that holds a
+    #     driver, in the order [min row, max row, min column, max column],
+    #     or None if a cell on the edge of the bounds has been emptied since
+    #     they were last found.
+
+    def __init__(self):
+        """Initialize a _Tier with no drivers.
+
+        @type self: _Tier
+        @rtype: None
+        """
+        self.cells = {}
+        self.count = 0
+        self._bounds = None
+
+    def add(self, driver, cell):
+        """Add <driver> to <cell>.
+
+        @type self: _Tier
+        @type driver: Driver
+        @type cell: (int, int)
+        @rtype: None
+        """
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            bucket = self.cells[cell] = {}
+        bucket[driver.id] = driver
+        self.count += 1
+        row, column = cell
+        if self._bounds is None:
+            if self.count == 1:
+                self._bounds = [row, row, column, column]
+        else:
+            bounds = self._bounds
+            bounds[0] = min(bounds[0], row)
+            bounds[1] = max(bounds[1], row)
+            bounds[2] = min(bounds[2], column)
+            bounds[3] = max(bounds[3], column)
+
+    def discard(self, driver, cell):
+        """Remove <driver> from <cell>.
+
+        @type self: _Tier
+        @type driver: Driver
+        @type cell: (int, int)
+        @rtype: None
+        """
+        bucket = self.cells[cell]
+        del bucket[driver.id]
+        if not bucket:
+            del self.cells[cell]
+            # The bounds may shrink, so find them again when next needed.
+            bounds = self._bounds
+            if bounds is not None and (cell[0] in (bounds[0], bounds[1])
+                                       or cell[1] in (bounds[2], bounds[3])):
+                self._bounds = None
+        self.count -= 1
+
+    def reach(self, row, column):
+        """Return the number of rings around cell (<row>, <column>) that
+        cover every cell that holds a driver, or -1 if none does.
+
+        @type self: _Tier
+        @type row: int
+        @type column: int
+        @rtype: int
+
+        >>> tier = _Tier()
+        >>> far = Driver("far", Location(9, 9), 1)
+        >>> tier.add(Driver("near", Location(0, 0), 1), (0, 0))
+        >>> tier.add(far, (9, 9))
+        >>> tier.reach(0, 0)
+        9
+        >>> tier.discard(far, (9, 9))
+        >>> tier.reach(0, 0)
+        0
+        """
+        if not self.cells:
+            return -1
+        low_row, high_row, low_column, high_column = self._extent()
+        return max(row - low_row, high_row - row,
+                   column - low_column, high_column - column, 0)
+
+    def ring(self, row, column, ring):
+        """Yield the drivers in the cells exactly <ring> cells away from cell
+        (<row>, <column>), in either direction.
+
+        @type self: _Tier
+        @type row: int
+        @type column: int
+        @type ring: int
+        @rtype: iterator[Driver]
+        """
+        cells = self.cells
+        if ring == 0:
+            bucket = cells.get((row, column))
+            if bucket:
+                yield from bucket.values()
+            return
+        low_row, high_row, low_column, high_column = self._extent()
+        first = max(column - ring, low_column)
+        last = min(column + ring, high_column)
+        for edge in (row - ring, row + ring):
+            if low_row <= edge <= high_row:
+                for other in range(first, last + 1):
+                    bucket = cells.get((edge, other))
+                    if bucket:
+                        yield from bucket.values()
+        first = max(row - ring + 1, low_row)
+        last = min(row + ring - 1, high_row)
+        for edge in (column - ring, column + ring):
+            if low_column <= edge <= high_column:
+                for other in range(first, last + 1):
+                    bucket = cells.get((other, edge))
+                    if bucket:
+                        yield from bucket.values()
+
+    def _extent(self):
+        """Return the bounds of the cells that hold a driver, finding them
+        again if they may have shrunk.
+
+        Precondition: some cell holds a driver.
+
+        @type self: _Tier
+        @rtype: list[int]
+        """
+        if self._bounds is None:
+            rows = [row for row, _ in self.cells]
+            columns = [column for _, column in self.cells]
+            self._bounds = [min(rows), max(rows), min(columns), max(columns)]
+        return self._bounds
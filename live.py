@@ -0,0 +1,88 @@
+import asyncio
+
+from event import create_event_list #imported for doctesting
+from simulation import Simulation #imported for doctesting
+
+"""
+The live module contains a stand-in for a live source of requests: a local
+server that replays an event file to every client that connects, for
+Simulation.run_live to read.
+"""
+
+
+async def replay(filename, writer, time_scale=None):
+    """Write the event lines of <filename> to <writer>, then close it.
+
+    If <time_scale> is None, the lines are written as fast as the reader
+    takes them. Otherwise each line is written when its timestamp comes, at
+    <time_scale> seconds per time unit from the start of the replay.
+
+    @type filename: str
+    @type writer: asyncio.StreamWriter
+    @type time_scale: float | None
+    @rtype: None
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        with open(filename, "rb") as file:
+            for line in file:
+                words = line.split()
+                if not words or words[0].startswith(b"#"):
+                    continue
+                if time_scale is not None:
+                    wait = started + int(words[0]) * time_scale - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                writer.write(line)
+                # Waiting for the buffer to drain passes the reader's
+                # backpressure on to the replay.
+                await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(filename, host="127.0.0.1", port=0, time_scale=None):
+    """Start a server on <host> and <port> that replays <filename> to every
+    client, and return it. Port 0 picks any free port.
+
+    @type filename: str
+    @type host: str
+    @type port: int
+    @type time_scale: float | None
+    @rtype: asyncio.Server
+
+    >>> async def demo():
+    ...     server = await serve("events.txt")
+    ...     host, port = server.sockets[0].getsockname()[:2]
+    ...     reader, writer = await asyncio.open_connection(host, port)
+    ...     simulation = Simulation()
+    ...     report = await simulation.run_live(reader, time_scale=0.001)
+    ...     writer.close()
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return report, simulation.latency()["count"]
+    >>> report, count = asyncio.run(demo())
+    >>> report == Simulation().run(create_event_list("events.txt"))
+    True
+    >>> count
+    12
+    """
+    async def client(reader, writer):
+        await replay(filename, writer, time_scale)
+
+    return await asyncio.start_server(client, host, port)
+
+
+if __name__ == "__main__":
+    async def main():
+        server = await serve("events.txt", time_scale=0.1)
+        host, port = server.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        simulation = Simulation()
+        print(await simulation.run_live(reader, time_scale=0.1))
+        print(simulation.latency())
+        writer.close()
+        server.close()
+
+    asyncio.run(main())
@@ -1,4 +1,19 @@
+from functools import lru_cache
+
+
 class Location:
+    """A location on the grid.
+
+    Locations are immutable and hashable, so equal locations can be shared;
+    use make_location to get a shared one.
+
+    === Attributes ===
+    @type row: int
+    @type column: int
+    """
+
+    __slots__ = ("row", "column")
+
     def __init__(self, row, column):
         """Initialize a location.
 
@@ -7,10 +22,36 @@ class Location:
         @type column: int
         @rtype: None
         """
-        # TODO
+        object.__setattr__(self, "row", row)
+        object.__setattr__(self, "column", column)
+
+    def __setattr__(self, name, value):
+        """Refuse to change a location, since it may be shared.
 
-        self.row = row
-        self.column = column
+        >>> location = Location(5, 10)
+        >>> location.row = 6
+        Traceback (most recent call last):
+        ...
+        AttributeError: Location is immutable
+        """
+        raise AttributeError("Location is immutable")
+
+    def __hash__(self):
+        """Return a hash that agrees with __eq__.
+
+        @rtype: int
+        >>> hash(Location(5, 5)) == hash(Location(5, 5))
+        True
+        """
+        return hash((self.row, self.column))
+
+    def __reduce__(self):
+        """Pickle a location as the arguments to make_location, so unpickled
+        locations are shared too.
+
+        @rtype: (callable, (int, int))
+        """
+        return make_location, (self.row, self.column)
 
     def __str__(self):
         """Return a string representation.
@@ -39,6 +80,23 @@ class Location:
         return (self.row == other.row and self.column == other.column)
 
 
+@lru_cache(maxsize=1 << 16)
+def make_location(row, column):
+    """Return the Location at <row>, <column>, shared with every other call
+    for the same coordinates.
+
+    The most recently used locations are kept in a table of bounded size, so
+    a location may be rebuilt after a long time unused.
+
+    @type row: int
+    @type column: int
+    @rtype: Location
+    >>> make_location(2, 5) is make_location(2, 5)
+    True
+    """
+    return Location(row, column)
+
+
 def manhattan_distance(origin, destination):
     """Return the Manhattan distance between the origin and the destination.
 
@@ -63,7 +121,10 @@ def deserialize_location(location_str):
     >>> location_str1 = "2,5"
     >>> print(deserialize_location(location_str1))
     2,5
+    >>> print(deserialize_location("12,305"))
+    12,305
     """
     # TODO
-    location  = Location(int(location_str[0]),int(location_str[2]))
+    row, column = location_str.split(",")
+    location  = make_location(int(row),int(column))
     return location
@@ -1,3 +1,5 @@
+from collections import deque
+
 from location import Location, manhattan_distance #imported for doctesting
 
 """
@@ -47,6 +49,8 @@ class Activity:
         The location at which the activity occurred.
     """
 
+    __slots__ = ("description", "time", "id", "location")
+
     def __init__(self, timestamp, description, identifier, location):
         """Initialize an Activity.
 
@@ -62,10 +66,26 @@ class Activity:
         self.id = identifier
         self.location = location
 
+    def __reduce__(self):
+        """Pickle an activity as the arguments to its constructor, which is
+        faster than pickling its attributes by name.
+
+        @type self: Activity
+        @rtype: (type, (int, str, str, Location))
+        """
+        return Activity, (self.time, self.description, self.id, self.location)
+
 
 class Monitor:
     """A monitor keeps a record of activities that it is notified about.
     When required, it generates a report of the activities it has recorded.
+
+    The distances in the report are those driven with the travel model of
+    the monitor, which must be the one the drivers were timed with.
+
+    === Attributes ===
+    @type travel: callable
+        The distance driven from one location to another.
     """
 
     # === Private Attributes ===
@@ -74,11 +94,14 @@ class Monitor:
     #       dictionary. The key of the second dictionary is an identifier
     #       and its value is a list of Activities.
 
-    def __init__(self):
+    def __init__(self, travel=manhattan_distance):
         """Initialize a Monitor.
 
         @type self: Monitor
+        @type travel: callable
+            The distance driven from one location to another.
         """
+        self.travel = travel
         self._activities = { RIDER: {}, DRIVER: {} }
         """@type _activities: dict[str, dict[str, list[Activity]]]"""
 
@@ -157,8 +180,8 @@ class Monitor:
         distance = 0
         numberOfDriver = 0
         for activities in self._activities[DRIVER].values():#The two loops looks through all the activities for each driver
-            for i in range(len(activities) -1):#Then performs a manhaatan distance on the locations of each activity
-                distance += manhattan_distance(activities[i].location,activities[i+1].location)
+            for i in range(len(activities) -1):#Then measures the drive between the locations of each activity
+                distance += self.travel(activities[i].location,activities[i+1].location)
             numberOfDriver += 1
         return  distance / numberOfDriver
 
@@ -183,6 +206,264 @@ class Monitor:
 
         for activity in self._activities[RIDER].values():
             if len(activity) == 3:#If a rider has 3 events it means they were picked up so we should find this average.
-                averageRideDistance += manhattan_distance(activity[1].location,activity[2].location)
+                averageRideDistance += self.travel(activity[1].location,activity[2].location)
 
         return averageRideDistance / count
+
+
+class StreamingMonitor(Monitor):
+    """A monitor that keeps running totals instead of a record of every
+    activity, so that its memory does not grow with the length of the
+    simulation.
+
+    Its report is the same as a Monitor's would be for the same activities,
+    provided that each rider identifier is used for a single request. Only
+    riders that are still waiting or riding, and the last location of each
+    driver, are kept.
+    """
+
+    # === Private Attributes ===
+    # @type _riders: dict[str, list]
+    #       Maps the identifier of every unfinished rider to a list holding
+    #       the number of activities recorded for the rider, the time of the
+    #       first one, and the location of the second one (None until then).
+    # @type _rider_count: int
+    #       The number of riders seen.
+    # @type _drivers: dict[str, Location]
+    #       Maps the identifier of every driver seen to the location of the
+    #       driver's latest activity.
+    # @type _wait_time: int
+    #       The total wait time of the riders that have finished waiting.
+    # @type _wait_count: int
+    #       The number of riders that have finished waiting.
+    # @type _total_distance: int
+    #       The total distance driven by all drivers.
+    # @type _ride_distance: int
+    #       The total distance driven on completed rides.
+
+    def __init__(self, travel=manhattan_distance):
+        """Initialize a StreamingMonitor.
+
+        @type self: StreamingMonitor
+        @type travel: callable
+            The distance driven from one location to another.
+        """
+        self.travel = travel
+        self._riders = {}
+        self._rider_count = 0
+        self._drivers = {}
+        self._wait_time = 0
+        self._wait_count = 0
+        self._total_distance = 0
+        self._ride_distance = 0
+
+    def __str__(self):
+        """Return a string representation.
+
+        @type self: StreamingMonitor
+        @rtype: str
+        """
+        return "Monitor ({0} drivers, {1} riders)".format(len(self._drivers), self._rider_count)
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity.
+
+        @type self: StreamingMonitor
+        @type timestamp: int
+            The time of the activity.
+        @type category: DRIVER | RIDER
+            The category for the activity.
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+            A description of the activity.
+        @type identifier: str
+            The identifier for the actor.
+        @type location: Location
+            The location of the activity.
+        @rtype: None
+        >>> monitor = StreamingMonitor()
+        >>> monitor.notify(0, DRIVER, REQUEST, "driver", Location(1, 1))
+        >>> monitor.notify(1, RIDER, REQUEST, "rider", Location(1, 3))
+        >>> monitor.notify(3, DRIVER, PICKUP, "driver", Location(1, 3))
+        >>> monitor.notify(3, RIDER, PICKUP, "rider", Location(1, 3))
+        >>> monitor.notify(8, RIDER, DROPOFF, "rider", Location(4, 5))
+        >>> print(monitor)
+        Monitor (1 drivers, 1 riders)
+        >>> monitor.report()
+        {'rider_wait_time': 2.0, 'driver_total_distance': 2.0, 'driver_ride_distance': 5.0}
+        """
+        if category == DRIVER:
+            last = self._drivers.get(identifier)
+            if last is not None:
+                self._total_distance += self.travel(last, location)
+            self._drivers[identifier] = location
+            return
+
+        state = self._riders.get(identifier)
+        if state is None:
+            self._riders[identifier] = [1, timestamp, None]
+            self._rider_count += 1
+        elif state[0] == 1:
+            # The rider has been picked up or has cancelled.
+            self._wait_time += timestamp - state[1]
+            self._wait_count += 1
+            if description == CANCEL:
+                del self._riders[identifier]
+            else:
+                state[0] = 2
+                state[2] = location
+        else:
+            # The rider has been dropped off.
+            self._ride_distance += self.travel(state[2], location)
+            del self._riders[identifier]
+
+    def report(self):
+        """Return a report of the activities that have occurred.
+
+        @type self: StreamingMonitor
+        @rtype: dict[str, object]
+        """
+        return {"rider_wait_time": self._wait_time / self._wait_count,
+                "driver_total_distance": self._total_distance / len(self._drivers),
+                "driver_ride_distance": self._ride_distance / len(self._drivers)}
+
+
+class WindowedMonitor(StreamingMonitor):
+    """A streaming monitor that also reports on windows of simulated time
+    while the simulation runs.
+
+    Windows are <width> time units long and a new one ends every <step>
+    time units, from time 0: with the default step they are tumbling, and
+    with a shorter one they are sliding. When a window ends, the callback is
+    called with its start, its end, and a report of the activities during
+    it, in the same form as the report of the whole run. A window report has
+    the average wait of the riders that stopped waiting during the window,
+    or None if there were none, and the distance driven, and driven on rides
+    dropped off, during the window per driver seen so far.
+
+    A window ends when the monitor is notified of an activity at or after
+    its end, or when it is advanced past it, so activities must be notified
+    in time order. Only the running totals at the last few window
+    boundaries are kept, so the cost of an activity does not depend on how
+    long the simulation has run.
+
+    A simulation with this monitor can only be checkpointed if the callback
+    can be pickled, so use a function defined at the top level of a module
+    rather than a lambda or a nested function.
+
+    >>> windows = []
+    >>> monitor = WindowedMonitor(4, lambda start, end, report: windows.append((start, end, report)))
+    >>> monitor.notify(0, DRIVER, REQUEST, "driver", Location(1, 1))
+    >>> monitor.notify(1, RIDER, REQUEST, "rider", Location(1, 3))
+    >>> monitor.notify(3, DRIVER, PICKUP, "driver", Location(1, 3))
+    >>> monitor.notify(3, RIDER, PICKUP, "rider", Location(1, 3))
+    >>> monitor.notify(8, RIDER, DROPOFF, "rider", Location(4, 5))
+    >>> windows
+    [(0, 4, {'rider_wait_time': 2.0, 'driver_total_distance': 2.0, 'driver_ride_distance': 0.0}), (4, 8, {'rider_wait_time': None, 'driver_total_distance': 0.0, 'driver_ride_distance': 0.0})]
+    >>> monitor.advance(12)
+    >>> windows[-1]
+    (8, 12, {'rider_wait_time': None, 'driver_total_distance': 0.0, 'driver_ride_distance': 5.0})
+    >>> monitor.report()
+    {'rider_wait_time': 2.0, 'driver_total_distance': 2.0, 'driver_ride_distance': 5.0}
+    """
+
+    # === Private Attributes ===
+    # @type _width: int
+    #       The length of a window.
+    # @type _step: int
+    #       The time between the ends of consecutive windows.
+    # @type _callback: callable
+    #       Called with the start, end and report of every window that ends.
+    # @type _next: int
+    #       The time of the next window boundary.
+    # @type _boundaries: deque[(int, int, int, int)]
+    #       The wait time, wait count, total distance and ride distance at
+    #       each of the latest window boundaries, enough to span a window.
+
+    def __init__(self, width, callback, step=None, travel=manhattan_distance):
+        """Initialize a WindowedMonitor with windows of <width> time units
+        that end every <step> time units, <width> by default.
+
+        @type self: WindowedMonitor
+        @type width: int
+        @type callback: callable
+        @type step: int | None
+        @type travel: callable
+            The distance driven from one location to another.
+        @rtype: None
+        >>> WindowedMonitor(5, print, 2)
+        Traceback (most recent call last):
+        ...
+        ValueError: the window width must be a positive multiple of the step
+        """
+        if step is None:
+            step = width
+        if step <= 0 or width <= 0 or width % step != 0:
+            raise ValueError("the window width must be a positive multiple of the step")
+        StreamingMonitor.__init__(self, travel)
+        self._width = width
+        self._step = step
+        self._callback = callback
+        self._next = step
+        self._boundaries = deque([(0, 0, 0, 0)], maxlen=width // step + 1)
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity, first ending every window
+        that ends at or before <timestamp>.
+
+        @type self: WindowedMonitor
+        @type timestamp: int
+            The time of the activity.
+        @type category: DRIVER | RIDER
+            The category for the activity.
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+            A description of the activity.
+        @type identifier: str
+            The identifier for the actor.
+        @type location: Location
+            The location of the activity.
+        @rtype: None
+        """
+        if timestamp >= self._next:
+            self.advance(timestamp)
+        StreamingMonitor.notify(self, timestamp, category, description,
+                                identifier, location)
+
+    def advance(self, timestamp):
+        """End every window that ends at or before <timestamp>, calling the
+        callback for each one in order.
+
+        Call it with the end of the simulation to report on the last window.
+
+        @type self: WindowedMonitor
+        @type timestamp: int
+        @rtype: None
+        >>> windows = []
+        >>> monitor = WindowedMonitor(4, lambda *window: windows.append(window[:2]), 2)
+        >>> monitor.advance(9)
+        >>> windows
+        [(0, 4), (2, 6), (4, 8)]
+        """
+        boundaries = self._boundaries
+        while self._next <= timestamp:
+            end = self._next
+            boundaries.append((self._wait_time, self._wait_count,
+                               self._total_distance, self._ride_distance))
+            self._next = end + self._step
+            if end >= self._width:
+                self._callback(end - self._width, end,
+                               self._window_report(boundaries[0], boundaries[-1]))
+
+    def _window_report(self, start, end):
+        """Return a report of a window from the running totals at its
+        <start> and <end>.
+
+        @type self: WindowedMonitor
+        @type start: (int, int, int, int)
+        @type end: (int, int, int, int)
+        @rtype: dict[str, object]
+        """
+        wait_count = end[1] - start[1]
+        drivers = len(self._drivers)
+        return {"rider_wait_time": (end[0] - start[0]) / wait_count if wait_count else None,
+                "driver_total_distance": (end[2] - start[2]) / drivers if drivers else None,
+                "driver_ride_distance": (end[3] - start[3]) / drivers if drivers else None}
@@ -18,6 +18,14 @@ SATISFIED = "satisfied"
 
 
 class Rider:
+    """A rider for a ride-sharing service.
+
+    === Attributes ===
+    @type cancellation: Event | None
+        The scheduled event that cancels this rider's request, if any.
+    """
+
+    __slots__ = ("id", "status", "destination", "location", "patience", "cancellation")
 
     def __init__(self,identifier,status,destination,origin,patience):
         """Initializes the Rider class
@@ -35,6 +43,7 @@ class Rider:
         self.destination = destination #locationClass
         self.location = origin #locationClass
         self.patience = patience
+        self.cancellation = None
 
     def updateStatus(self,newStatus):
         """Changes the status of the rider accordingly.
@@ -0,0 +1,454 @@
+from collections import OrderedDict
+from heapq import heappop, heappush
+
+from location import Location, manhattan_distance #imported for doctesting
+from driver import Driver #imported for doctesting
+
+"""
+The roads module contains the RoadNetwork class, a travel model for drivers
+on a grid of roads with blocked cells, one-way streets and slow streets.
+
+Drivers move on an open grid by default, where the distance between two
+locations is their Manhattan distance. To make them drive on a road network
+instead, give the network's distance method to the dispatcher as its travel
+model:
+
+    Simulation(dispatcher=Dispatcher(travel=network.distance))
+
+The dispatcher passes it on to its DriverGrid, RiderPool and FleetState,
+the events time every drive with it, and the simulation gives it to its
+monitor, so the distances in the report are driven on the network too.
+Every step on the network costs at least one block, so a distance on the
+network is never shorter than the Manhattan distance, and the searches of
+grid.DriverGrid and grid.RiderPool, which are bounded by it, still find the
+nearest driver or rider. The network is pickled with the dispatcher, into
+checkpoints and into the worker processes of sharded and sweep runs,
+without its cached searches.
+"""
+
+# The row and column offsets of the neighbours of a cell.
+_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class RoadNetwork:
+    """A grid of <rows> by <columns> cells, from 0,0 to rows - 1,columns - 1,
+    where a driver steps from a cell to a neighbouring one along a road.
+
+    Each step costs one block, unless given another cost. Blocked cells
+    cannot be entered, and a step given no cost cannot be taken, which makes
+    a one-way street of a step that can still be taken the other way.
+
+    A single distance is found by A* search, guided by the Manhattan
+    distance. When the same destination is asked about twice in a row, as
+    when the nearest of many drivers to a rider is looked for, it gets a
+    search of its own by Dijkstra's algorithm, backwards from it. That
+    search stops as soon as the origin is reached and is carried on for the
+    next origin, so all the distances to the destination cost at most one
+    search. In the same way, when the same origin is asked about twice in a
+    row, as when the nearest of many riders to a driver is looked for, it
+    gets a search of its own forwards from it. The searches for the most
+    recently used destinations, and origins, are kept in caches of bounded
+    size. The distances to and from chosen hot
+    locations, such as the centres of busy areas, can be computed up front
+    for every cell.
+
+    === Attributes ===
+    @type rows: int
+        The number of rows of the grid.
+    @type columns: int
+        The number of columns of the grid.
+
+    >>> network = RoadNetwork(3, 3, blocked=[Location(1, 1)],
+    ...                       costs={(Location(0, 0), Location(0, 1)): None})
+    >>> network.distance(Location(0, 1), Location(2, 1))
+    4
+    >>> network.distance(Location(0, 1), Location(0, 0))
+    1
+    >>> network.distance(Location(0, 0), Location(0, 1))
+    7
+    >>> Driver("ann", Location(0, 1), 2).get_travel_time(Location(2, 1), network.distance)
+    2
+    >>> from simulation import Simulation
+    >>> from dispatcher import Dispatcher
+    >>> from event import create_event_list
+    >>> network = RoadNetwork(6, 6, blocked=[Location(3, 3), Location(2, 4), Location(4, 4)])
+    >>> Simulation(dispatcher=Dispatcher(travel=network.distance)).run(create_event_list("events.txt"))
+    {'rider_wait_time': 0.5, 'driver_total_distance': 5.0, 'driver_ride_distance': 4.166666666666667}
+    """
+
+    # === Private Attributes ===
+    # @type _edges: list[list[(int, int)]]
+    #     The cell and cost of every step out of each cell, where cells are
+    #     numbered row by row.
+    # @type _reverse: list[list[(int, int)]]
+    #     The cell and cost of every step into each cell.
+    # @type _open: list[bool]
+    #     Whether each cell can be entered.
+    # @type _cache: OrderedDict[int, _Search]
+    #     The backward searches from the most recently used destination
+    #     cells, least recently used first.
+    # @type _forward: OrderedDict[int, _Search]
+    #     The forward searches from the most recently used origin cells,
+    #     least recently used first.
+    # @type _cache_size: int
+    #     The most searches to keep in each cache.
+    # @type _to: dict[int, list[int]]
+    #     The distance from every cell to each hot cell.
+    # @type _from: dict[int, list[int]]
+    #     The distance from each hot cell to every cell.
+    # @type _last: int | None
+    #     The destination cell last asked about.
+    # @type _last_start: int | None
+    #     The origin cell last asked about.
+    # @type _hits: int
+    #     The number of distances already known when asked for.
+    # @type _misses: int
+    #     The number of distances that needed a search to go on.
+
+    def __init__(self, rows, columns, blocked=(), costs=None, cache_size=256):
+        """Initialize a RoadNetwork.
+
+        Raise ValueError if a cost is not for a step between neighbouring
+        cells, or is below one, or if some open cell cannot be reached from
+        another.
+
+        @type self: RoadNetwork
+        @type rows: int
+        @type columns: int
+        @type blocked: iterable[Location]
+            The cells that cannot be entered.
+        @type costs: dict[(Location, Location), int | None] | None
+            The cost of the step from the first location to the second, or
+            None if it cannot be taken, for the steps that do not cost one.
+        @type cache_size: int
+            The most destinations, and the most origins, to keep searches
+            for, each of which takes up to rows * columns distances.
+        @rtype: None
+        >>> RoadNetwork(1, 3, blocked=[Location(0, 1)])
+        Traceback (most recent call last):
+        ...
+        ValueError: 0,2 cannot be reached from 0,0
+        """
+        self.rows = rows
+        self.columns = columns
+        self._open = [True] * (rows * columns)
+        for location in blocked:
+            if not (0 <= location.row < rows and 0 <= location.column < columns):
+                raise ValueError("{} is off the grid".format(location))
+            self._open[location.row * columns + location.column] = False
+        costs = {} if costs is None else costs
+        for (origin, destination), cost in costs.items():
+            if manhattan_distance(origin, destination) != 1:
+                raise ValueError("{} and {} are not neighbours".format(origin, destination))
+            if cost is not None and cost < 1:
+                raise ValueError("the step from {} to {} costs less than one block"
+                                 .format(origin, destination))
+        self._edges = [[] for _ in self._open]
+        self._reverse = [[] for _ in self._open]
+        for row in range(rows):
+            for column in range(columns):
+                cell = row * columns + column
+                if not self._open[cell]:
+                    continue
+                for row_step, column_step in _STEPS:
+                    other_row, other_column = row + row_step, column + column_step
+                    if not (0 <= other_row < rows and 0 <= other_column < columns):
+                        continue
+                    other = other_row * columns + other_column
+                    if not self._open[other]:
+                        continue
+                    cost = costs.get((Location(row, column), Location(other_row, other_column)), 1)
+                    if cost is not None:
+                        self._edges[cell].append((other, cost))
+                        self._reverse[other].append((cell, cost))
+        self._check_connected()
+        self._cache = OrderedDict()
+        self._forward = OrderedDict()
+        self._cache_size = cache_size
+        self._to = {}
+        self._from = {}
+        self._last = None
+        self._last_start = None
+        self._hits = 0
+        self._misses = 0
+
+    def __getstate__(self):
+        """Return the state of this network to pickle, which leaves out the
+        cached searches.
+
+        @type self: RoadNetwork
+        @rtype: dict[str, object]
+        """
+        state = self.__dict__.copy()
+        state["_cache"] = OrderedDict()
+        state["_forward"] = OrderedDict()
+        state["_last"] = None
+        state["_last_start"] = None
+        return state
+
+    def distance(self, origin, destination):
+        """Return the length of the shortest drive from <origin> to
+        <destination>.
+
+        Raise ValueError if either is off the grid or blocked.
+
+        @type self: RoadNetwork
+        @type origin: Location
+        @type destination: Location
+        @rtype: int
+        >>> network = RoadNetwork(2, 2, costs={(Location(0, 0), Location(0, 1)): 5})
+        >>> network.distance(Location(0, 0), Location(0, 1))
+        3
+        >>> network.distance(Location(0, 0), Location(5, 5))
+        Traceback (most recent call last):
+        ...
+        ValueError: 5,5 is off the grid
+
+        Asking about the same origin again searches forwards from it, and
+        carries that search on for the destinations after.
+
+        >>> network = RoadNetwork(5, 5)
+        >>> [network.distance(Location(2, 2), Location(row, 4)) for row in range(5)]
+        [4, 3, 2, 3, 4]
+        >>> network.cache_info()
+        {'hits': 1, 'misses': 4, 'size': 1}
+        >>> network.distance(Location(2, 2), Location(0, 0))
+        4
+        >>> network.cache_info()
+        {'hits': 2, 'misses': 4, 'size': 1}
+        """
+        start = self._index(origin)
+        goal = self._index(destination)
+        table = self._to.get(goal)
+        if table is not None:
+            self._hits += 1
+            return table[start]
+        table = self._from.get(start)
+        if table is not None:
+            self._hits += 1
+            return table[goal]
+        if goal in self._cache or start not in self._forward and goal == self._last:
+            search, cell = self._cached(self._cache, goal, self._reverse), start
+        elif start in self._forward or start == self._last_start:
+            search, cell = self._cached(self._forward, start, self._edges), goal
+        else:
+            self._last = goal
+            self._last_start = start
+            self._misses += 1
+            return self._search(start, goal)
+        if search.settled[cell]:
+            self._hits += 1
+            return search.distances[cell]
+        self._misses += 1
+        return search.distance(cell)
+
+    def precompute(self, locations):
+        """Compute the distances from every cell to each of <locations>, and
+        from each of them to every cell, so that those distances never need
+        a search.
+
+        The tables take two lists of rows * columns distances per location,
+        and are kept for the life of the network.
+
+        @type self: RoadNetwork
+        @type locations: iterable[Location]
+        @rtype: None
+        >>> network = RoadNetwork(3, 3, blocked=[Location(1, 1)])
+        >>> network.precompute([Location(2, 1)])
+        >>> network.distance(Location(0, 1), Location(2, 1))
+        4
+        >>> network.cache_info()
+        {'hits': 1, 'misses': 0, 'size': 0}
+        """
+        for location in locations:
+            cell = self._index(location)
+            self._to[cell] = _Search(cell, self._reverse).fill()
+            self._from[cell] = _Search(cell, self._edges).fill()
+
+    def cache_info(self):
+        """Return the number of distances that were already known when asked
+        for, the number that needed a search to go on, and the number of
+        searches in the cache.
+
+        @type self: RoadNetwork
+        @rtype: dict[str, int]
+        """
+        return {"hits": self._hits, "misses": self._misses,
+                "size": len(self._cache) + len(self._forward)}
+
+    def _cached(self, cache, cell, edges):
+        """Return the search from cell <cell> along <edges> in <cache>,
+        starting one if there is none, and mark it as the most recently used.
+
+        @type self: RoadNetwork
+        @type cache: OrderedDict[int, _Search]
+        @type cell: int
+        @type edges: list[list[(int, int)]]
+        @rtype: _Search
+        """
+        search = cache.get(cell)
+        if search is None:
+            search = cache[cell] = _Search(cell, edges)
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(cell)
+        return search
+
+    def _index(self, location):
+        """Return the number of the cell at <location>.
+
+        Raise ValueError if it is off the grid or blocked.
+
+        @type self: RoadNetwork
+        @type location: Location
+        @rtype: int
+        """
+        row, column = location.row, location.column
+        if not (0 <= row < self.rows and 0 <= column < self.columns):
+            raise ValueError("{} is off the grid".format(location))
+        cell = row * self.columns + column
+        if not self._open[cell]:
+            raise ValueError("{} is blocked".format(location))
+        return cell
+
+    def _search(self, start, goal):
+        """Return the length of the shortest drive from cell <start> to cell
+        <goal>, found by A* search.
+
+        The Manhattan distance never overestimates the distance left, since
+        every step costs at least one block, and it changes by at most the
+        cost of a step, so a cell's distance is final once it is taken off
+        the heap.
+
+        @type self: RoadNetwork
+        @type start: int
+        @type goal: int
+        @rtype: int
+        """
+        columns = self.columns
+        edges = self._edges
+        goal_row, goal_column = divmod(goal, columns)
+        row, column = divmod(start, columns)
+        best = {start: 0}
+        # Ties go to the cell furthest along, which keeps the search from
+        # filling the whole rectangle between the two cells on an open grid.
+        heap = [(abs(row - goal_row) + abs(column - goal_column), 0, start)]
+        while heap:
+            _, distance, cell = heappop(heap)
+            distance = -distance
+            if cell == goal:
+                return distance
+            if distance > best[cell]:
+                continue
+            for other, cost in edges[cell]:
+                total = distance + cost
+                known = best.get(other)
+                if known is None or total < known:
+                    best[other] = total
+                    row, column = divmod(other, columns)
+                    heappush(heap, (total + abs(row - goal_row) + abs(column - goal_column),
+                                    -total, other))
+        # Every open cell can be reached from every other one.
+        raise AssertionError("no drive from cell {} to cell {}".format(start, goal))
+
+    def _check_connected(self):
+        """Raise ValueError unless every open cell can be reached from every
+        other open cell.
+
+        @type self: RoadNetwork
+        @rtype: None
+        """
+        cells = [cell for cell, is_open in enumerate(self._open) if is_open]
+        if not cells:
+            return
+        for edges in (self._edges, self._reverse):
+            seen = [False] * len(self._open)
+            seen[cells[0]] = True
+            stack = [cells[0]]
+            while stack:
+                for other, _ in edges[stack.pop()]:
+                    if not seen[other]:
+                        seen[other] = True
+                        stack.append(other)
+            for cell in cells:
+                if not seen[cell]:
+                    first, other = (cells[0], cell) if edges is self._edges else (cell, cells[0])
+                    raise ValueError("{} cannot be reached from {}".format(
+                        Location(*divmod(other, self.columns)),
+                        Location(*divmod(first, self.columns))))
+
+
+class _Search:
+    """A search by Dijkstra's algorithm for the distances from a cell along
+    a set of steps, which goes only as far as needed and can be carried on.
+
+    === Attributes ===
+    @type distances: list[int | None]
+        The shortest distance found so far to each cell, or None if none
+        has been found.
+    @type settled: bytearray
+        Whether the distance to each cell is final.
+    """
+
+    __slots__ = ("distances", "settled", "_heap", "_edges")
+
+    # === Private Attributes ===
+    # @type _heap: list[(int, int)]
+    #     The distance and cell of every cell reached but maybe not settled.
+    # @type _edges: list[list[(int, int)]]
+    #     The cell and cost of every step out of each cell.
+
+    def __init__(self, start, edges):
+        """Initialize a _Search from cell <start> along <edges>.
+
+        @type self: _Search
+        @type start: int
+        @type edges: list[list[(int, int)]]
+        @rtype: None
+        """
+        self.distances = [None] * len(edges)
+        self.distances[start] = 0
+        self.settled = bytearray(len(edges))
+        self._heap = [(0, start)]
+        self._edges = edges
+
+    def distance(self, goal):
+        """Carry on the search until the distance to cell <goal> is final,
+        and return it.
+
+        Precondition: <goal> can be reached.
+
+        @type self: _Search
+        @type goal: int
+        @rtype: int
+        """
+        distances = self.distances
+        settled = self.settled
+        heap = self._heap
+        edges = self._edges
+        while not settled[goal]:
+            distance, cell = heappop(heap)
+            if settled[cell]:
+                continue
+            settled[cell] = 1
+            for other, cost in edges[cell]:
+                total = distance + cost
+                known = distances[other]
+                if known is None or total < known:
+                    distances[other] = total
+                    heappush(heap, (total, other))
+        return distances[goal]
+
+    def fill(self):
+        """Carry on the search until every distance is final, and return the
+        distances.
+
+        @type self: _Search
+        @rtype: list[int | None]
+        """
+        settled = self.settled
+        for cell, edges in enumerate(self._edges):
+            if edges and not settled[cell]:
+                self.distance(cell)
+        return self.distances
@@ -0,0 +1,580 @@
+from bisect import bisect_left, bisect_right
+from multiprocessing import Pipe, Process
+import warnings
+
+from container import PriorityQueue
+from dispatcher import Dispatcher
+from event import (Cancellation, DriverRequest, Dropoff, Event, Pickup,
+                   RiderRequest, create_event_list)
+from location import manhattan_distance
+from monitor import Monitor, RIDER, DRIVER
+from rider import WAITING
+from simulation import Simulation #imported for doctesting
+
+"""
+The sharded module contains the ShardedSimulation class, which splits the
+grid into regions and simulates each region in its own process.
+
+The regions are strips of columns of equal width. Each region has its own
+Dispatcher, PriorityQueue and Monitor, and owns the drivers located in it
+and the riders whose origin is in it. Riders are matched with the drivers
+their region owns. Two things cross regions: a Dropoff at a destination in
+another region, which carries the driver and the rider to the region of
+the destination, where the driver becomes available, and idle drivers lent
+from one region to another.
+
+The regions advance together in time windows. A ride that crosses into
+another region takes at least its lookahead: the distance from the
+origin of the rider to the destination, divided by the highest driver
+speed. A window ends no later than the earliest time at which a rider
+waiting for such a ride, or one that will request it, could be dropped
+off in another region, so each region can do the events of a window
+without waiting for the others. A Dropoff handed off at the last time of
+its own window is done after the other events of its region at that
+time. Drivers are only lent between windows, so windows are also no
+longer than the window given to ShardedSimulation.
+
+Between windows, the idle drivers are shared out between the regions in
+proportion to the riders that will request a ride in the next window. A
+region with more idle drivers than its share lends those nearest to the
+regions short of them. A lent driver stays where it is, so a rider of
+the region it is lent to is driven to from there, as a Simulation would
+have sent a driver across the edge of a region.
+
+=== Tolerance ===
+With a single region, the report is exactly that of a Simulation. With
+more regions, drivers are only lent between windows, so a region can
+still run short of idle drivers within a window, and events at the same
+time in different regions may be done in another order. No bound is
+enforced; these are the worst drifts measured from a Simulation. On
+workloads written by workload.write_workload with 3000 riders, 3 riders
+per time unit, 80 drivers on a 40 by 40 grid and 2 hotspots, over seeds
+0 to 9:
+
+    regions  rider_wait_time   driver_total_distance  driver_ride_distance
+    2        +10.7% (seed 6)   +1.6% (seed 1)         -0.4% (seed 3)
+    4        +23.0% (seed 6)   +2.9% (seed 6)         -1.1% (seed 1)
+
+With 200000 riders on the same grid and seed 0, two regions waited 7.6%
+longer with 1.1% more driving, and four regions 19.6% longer with 2.1%
+more.
+
+A region that runs out of idle drivers drifts much further. A driver that
+requests a rider while riders are waiting is sent to the first one,
+whether or not another driver is on the way, and is lost if that rider is
+picked up first, so a region short of drivers loses more of them. With 60
+drivers and seed 6, two regions waited 9% longer than a Simulation, but
+four regions lost most of their drivers, waiting over six times as long
+with a fifth of the distances, while a Simulation of the same workload
+kept enough idle drivers. ShardedSimulation.run warns when a region runs
+out of idle drivers and none can be lent to it.
+
+=== Speed ===
+Sharding is currently slower than a Simulation. The regions exchange
+messages at the end of every window, and windows are short. On a machine
+with a single CPU, ten runs of the 3000 rider workloads above took 1.8
+seconds as a Simulation, 4.8 seconds on two regions and 6.3 seconds on
+four, and the 200000 rider workload took 17 seconds, 40 seconds and 50
+seconds. No speedup on several CPUs has been measured.
+"""
+
+
+class ShardedSimulation:
+    """A simulation whose grid is split into regions, each simulated in its
+    own process.
+    """
+
+    # === Private Attributes ===
+    # @type _regions: int
+    #     The number of regions.
+    # @type _monitor: Monitor
+    #     The monitor the activities of every region are merged into.
+    # @type _travel: callable
+    #     The distance driven from one location to another.
+    # @type _window: int
+    #     The longest a time window can be.
+
+    def __init__(self, regions=2, monitor=None, travel=manhattan_distance,
+                 window=2):
+        """Initialize a ShardedSimulation.
+
+        The merged activities of all regions are given to <monitor>, or to a
+        new Monitor if <monitor> is None. Every region's dispatcher, and the
+        monitor, use the travel model <travel>, which is passed to the
+        process of each region.
+
+        @type self: ShardedSimulation
+        @type regions: int
+            The number of regions. Precondition: regions > 0
+        @type monitor: Monitor | None
+            A monitor that has not been notified of any activities.
+        @type travel: callable
+            The distance driven from one location to another, which is never
+            shorter than the Manhattan distance.
+        @type window: int
+            The longest a time window can be, in time units, since idle
+            drivers are only lent between windows. Precondition: window > 0
+        @rtype: None
+        """
+        if monitor is None:
+            monitor = Monitor(travel)
+        elif monitor.travel != travel:
+            raise ValueError("the monitor and the regions have different travel models")
+        self._regions = regions
+        self._monitor = monitor
+        self._travel = travel
+        self._window = window
+
+    def run(self, initial_events):
+        """Run the simulation on the list of events in <initial_events>, and
+        return a dictionary containing statistics of the simulation, as
+        Simulation.run does.
+
+        A RuntimeWarning is issued the first time a region runs out of idle
+        drivers and none can be lent to it, since the report may then drift
+        far from that of a Simulation.
+
+        @type self: ShardedSimulation
+        @type initial_events: list[Event]
+            An initial list of DriverRequest and RiderRequest events.
+        @rtype: dict[str, object]
+
+        >>> one = ShardedSimulation(1).run(create_event_list("events.txt"))
+        >>> one == Simulation().run(create_event_list("events.txt"))
+        True
+        >>> ShardedSimulation(2).run(create_event_list("events.txt"))
+        {'rider_wait_time': 1.0, 'driver_total_distance': 5.166666666666667, 'driver_ride_distance': 3.8333333333333335}
+
+        The merged activities are given to the monitor in time order, so a
+        WindowedMonitor reports on each window as it would in a Simulation.
+
+        >>> from monitor import WindowedMonitor
+        >>> waits = []
+        >>> monitor = WindowedMonitor(10, lambda start, end, report:
+        ...                           waits.append((end, report["rider_wait_time"])))
+        >>> ShardedSimulation(2, monitor).run(create_event_list("events.txt"))["rider_wait_time"]
+        1.0
+        >>> waits
+        [(10, 0.0), (20, 1.5), (30, 1.5)]
+        """
+        strips = _Strips(initial_events, self._regions)
+
+        # Where each actor has been, as (region, time of arrival) pairs.
+        visits = {}
+        shares = [[] for _ in range(self._regions)]
+        # The times riders request rides in each region, in order.
+        requests = [[] for _ in range(self._regions)]
+        # The request time and lookahead of every ride into another region.
+        crossings = []
+        for event in initial_events:
+            if isinstance(event, DriverRequest):
+                key = (DRIVER, event.driver.id)
+                region = strips.region(event.driver.location)
+            else:
+                key = (RIDER, event.rider.id)
+                region = strips.region(event.rider.location)
+                requests[region].append(event.timestamp)
+                lookahead = strips.lookahead(event.rider)
+                if lookahead is not None:
+                    crossings.append((event.timestamp, lookahead))
+            visits.setdefault(key, [(region, event.timestamp)])
+            shares[region].append(event)
+        for requested in requests:
+            requested.sort()
+        crossings.sort()
+        crossed = [timestamp for timestamp, _ in crossings]
+        # The earliest that any of the rides into another region requested
+        # from each of them on can end.
+        earliest = [timestamp + lookahead for timestamp, lookahead in crossings]
+        for i in range(len(earliest) - 2, -1, -1):
+            earliest[i] = min(earliest[i], earliest[i + 1])
+
+        connections = []
+        processes = []
+        for region, share in enumerate(shares):
+            connection, worker = Pipe()
+            process = Process(target=_run_region,
+                              args=(worker, region, strips, share, self._travel),
+                              daemon=True)
+            process.start()
+            worker.close()
+            connections.append(connection)
+            processes.append(process)
+
+        try:
+            arrivals = [[] for _ in range(self._regions)]
+            loans = [[] for _ in range(self._regions)]
+            upcoming = [min(share).timestamp if share else None for share in shares]
+            reaches = [None] * self._regions
+            idle = None
+            starved = False
+            while True:
+                times = [time for time in upcoming if time is not None]
+                times.extend(event.timestamp for inbox in arrivals
+                             for event in inbox)
+                if not times:
+                    break
+                start = min(times)
+                # The window ends when the first Dropoff into another region
+                # could be: that of a rider who has requested a ride and not
+                # been picked up yet, if picked up at the start, or that of
+                # a rider yet to request one.
+                ends = [start + self._window]
+                ends.extend(start + reach for reach in reaches if reach is not None)
+                first = bisect_left(crossed, start)
+                if first < len(earliest):
+                    ends.append(earliest[first])
+                end = max(min(ends), start + 1)
+                if idle is not None and self._regions > 1:
+                    # Share out the idle drivers reported at the end of the
+                    # last window, before any region goes past it.
+                    needs = [bisect_left(requested, end) - bisect_left(requested, start)
+                             for requested in requests]
+                    lent = _lend(strips, idle, needs)
+                    borrowers = {target for pairs in lent for _, target in pairs}
+                    for region, need in enumerate(needs):
+                        if need and not idle[region] and region not in borrowers \
+                                and not starved:
+                            starved = True
+                            warnings.warn("region {} ran out of idle drivers at time {}, "
+                                          "so the report may drift far from that of a "
+                                          "Simulation".format(region, now),
+                                          RuntimeWarning)
+                    for donor, pairs in enumerate(lent):
+                        if pairs:
+                            connections[donor].send([identifier
+                                                     for identifier, _ in pairs])
+                    for donor, pairs in enumerate(lent):
+                        if pairs:
+                            drivers = connections[donor].recv()
+                            for driver, (_, target) in zip(drivers, pairs):
+                                loans[target].append(driver)
+                                visits[(DRIVER, driver.id)].append((target, now))
+                for connection, inbox, borrowed in zip(connections, arrivals, loans):
+                    connection.send((end, inbox, borrowed))
+                arrivals = [[] for _ in range(self._regions)]
+                loans = [[] for _ in range(self._regions)]
+                idle = []
+                for region, connection in enumerate(connections):
+                    departures, upcoming[region], drivers, reaches[region] \
+                        = connection.recv()
+                    idle.append(drivers)
+                    for dropoff in departures:
+                        target = strips.region(dropoff.rider.destination)
+                        arrivals[target].append(dropoff)
+                        for key in ((DRIVER, dropoff.driver.id),
+                                    (RIDER, dropoff.rider.id)):
+                            visits[key].append((target, dropoff.timestamp))
+                now = end
+            activities = []
+            for connection in connections:
+                connection.send(None)
+                activities.append(connection.recv())
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join()
+
+        _merge(activities, visits, self._monitor)
+        return self._monitor.report()
+
+
+class _Strips:
+    """The split of a grid into strips of columns of equal width.
+
+    === Attributes ===
+    @type low: int
+        The first column of the first strip.
+    @type width: int
+        The number of columns in each strip.
+    @type count: int
+        The number of strips. Columns past the last strip belong to it.
+    @type speed: int
+        The highest speed of the drivers.
+    """
+
+    def __init__(self, events, count):
+        """Initialize the split into <count> strips of the columns used by
+        the drivers and riders in <events>.
+
+        @type self: _Strips
+        @type events: list[Event]
+        @type count: int
+        @rtype: None
+        """
+        columns = []
+        self.speed = 1
+        for event in events:
+            if isinstance(event, DriverRequest):
+                columns.append(event.driver.location.column)
+                self.speed = max(self.speed, event.driver.speed)
+            elif isinstance(event, RiderRequest):
+                columns.append(event.rider.location.column)
+                columns.append(event.rider.destination.column)
+        self.low = min(columns, default=0)
+        self.width = max(-(-(max(columns, default=0) - self.low + 1) // count), 1)
+        self.count = count
+
+    def region(self, location):
+        """Return the strip that holds <location>.
+
+        @type self: _Strips
+        @type location: Location
+        @rtype: int
+
+        >>> from location import Location
+        >>> strips = _Strips(create_event_list("events.txt"), 2)
+        >>> [strips.region(Location(1, column)) for column in range(1, 6)]
+        [0, 0, 0, 1, 1]
+        """
+        return max(min((location.column - self.low) // self.width,
+                       self.count - 1), 0)
+
+    def distance(self, location, strip):
+        """Return the number of columns between <location> and the strip
+        <strip>, or 0 if <location> is in it.
+
+        @type self: _Strips
+        @type location: Location
+        @type strip: int
+        @rtype: int
+
+        >>> from location import Location
+        >>> strips = _Strips(create_event_list("events.txt"), 2)
+        >>> [strips.distance(Location(1, column), 1) for column in range(1, 6)]
+        [3, 2, 1, 0, 0]
+        """
+        first = self.low + strip * self.width
+        last = first + self.width - 1
+        if strip == 0:
+            first = location.column
+        if strip == self.count - 1:
+            last = location.column
+        return max(first - location.column, location.column - last, 0)
+
+    def lookahead(self, rider):
+        """Return the shortest time the ride of <rider> can take, if it ends
+        in another strip than it starts in, or None if it does not.
+
+        The Manhattan distance is used, since no travel model gives a
+        shorter one.
+
+        @type self: _Strips
+        @type rider: Rider
+        @rtype: int | None
+
+        >>> strips = _Strips(create_event_list("events.txt"), 2)
+        >>> riders = [event.rider for event in create_event_list("events.txt")
+        ...           if isinstance(event, RiderRequest)]
+        >>> [strips.lookahead(rider) for rider in riders]
+        [8, None, 6, None, 3, 4]
+        """
+        if self.region(rider.location) == self.region(rider.destination):
+            return None
+        return manhattan_distance(rider.location, rider.destination) // self.speed
+
+
+def _run_region(connection, region, strips, events, travel):
+    """Simulate the region <region> of <strips>, starting from <events>, one
+    time window at a time, as the coordinator asks over <connection>.
+
+    Each message from the coordinator is either the end of the next window,
+    the Dropoffs handed off to this region and the drivers lent to it, the
+    ids of idle drivers to lend to another region, which are sent back, or
+    None when the simulation is over. After a window, the Dropoffs for other
+    regions, the time of the next pending event, or None, the id and
+    location of each idle driver and the shortest lookahead of the riders
+    still waiting for a ride into another region, or None, are sent back;
+    at the end, the activities recorded by the region's monitor.
+
+    @type connection: multiprocessing.connection.Connection
+    @type region: int
+    @type strips: _Strips
+    @type events: list[Event]
+    @type travel: callable
+        The distance driven from one location to another.
+    @rtype: None
+    """
+    queue = PriorityQueue()
+    dispatcher = Dispatcher(travel=travel)
+    monitor = Monitor(travel)
+    queue.add_all(events)
+    # The lookahead of each rider whose ride ends in another region, who has
+    # requested it and has not been picked up or cancelled yet.
+    crossing = {}
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if isinstance(message, list):
+            # Lend the idle drivers asked for to another region.
+            drivers = [dispatcher.driverFleet.pop(identifier)
+                       for identifier in message]
+            for driver in drivers:
+                dispatcher.deActivateDriver(driver)
+            connection.send(drivers)
+            continue
+        end, arrivals, loans = message
+        for dropoff in arrivals:
+            # Register the driver here, so that its next request does not
+            # make it available twice.
+            dispatcher.driverFleet[dropoff.driver.id] = dropoff.driver
+            dropoff.handle = queue.add(dropoff)
+        dispatcher.register_drivers(loans)
+        departures = []
+        while not queue.is_empty() and queue.peek().timestamp < end:
+            event = queue.remove()
+            spawned = event.do(dispatcher, monitor)
+            if isinstance(event, RiderRequest):
+                lookahead = strips.lookahead(event.rider)
+                if lookahead is not None:
+                    crossing[event.rider.id] = lookahead
+            elif isinstance(event, (Pickup, Cancellation)) \
+                    and event.rider.status != WAITING:
+                crossing.pop(event.rider.id, None)
+            for event in spawned:
+                if isinstance(event, Dropoff) \
+                        and strips.region(event.rider.destination) != region:
+                    del dispatcher.driverFleet[event.driver.id]
+                    departures.append(event)
+                    handoff = _Handoff(event.timestamp, event.rider)
+                    handoff.handle = queue.add(handoff)
+                else:
+                    event.handle = queue.add(event)
+        connection.send((departures,
+                         None if queue.is_empty() else queue.peek().timestamp,
+                         [(driver.id, driver.location)
+                          for driver in dispatcher.availableDriver],
+                         min(crossing.values(), default=None)))
+    connection.send(monitor._activities)
+    connection.close()
+
+
+class _Handoff(Event):
+    """The part of a Dropoff handed off to another region that is done in
+    the region the ride started in: the rider leaves its waiting list, at
+    the time of the Dropoff, as they would have in a Simulation.
+
+    === Attributes ===
+    @type rider: Rider
+        The rider of the Dropoff.
+    """
+
+    __slots__ = ("rider",)
+
+    def __init__(self, timestamp, rider):
+        """Initialize a _Handoff of the Dropoff of <rider> at <timestamp>.
+
+        @type self: _Handoff
+        @type timestamp: int
+        @type rider: Rider
+        @rtype: None
+        """
+        super().__init__(timestamp)
+        self.rider = rider
+
+    def do(self, dispatcher, monitor, sink=None):
+        """Take the rider off the waiting list. No events are spawned.
+
+        @type self: _Handoff
+        @type dispatcher: Dispatcher
+        @type monitor: Monitor
+        @type sink: callable | None
+        @rtype: list[Event] | None
+        """
+        dispatcher.cancel_ride(self.rider)
+        return [] if sink is None else None
+
+    def __str__(self):
+        """Return a string representation of this event.
+
+        @type self: _Handoff
+        @rtype: str
+        """
+        return "{} -- {}: Hand off".format(self.timestamp, self.rider)
+
+
+def _lend(strips, idle, needs):
+    """Return the idle drivers each region lends to regions short of them.
+
+    A region is short of idle drivers if it has fewer than it needs. The
+    drivers lent are those nearest to the region short of them, from regions
+    with more idle drivers than they need.
+
+    @type strips: _Strips
+    @type idle: list[list[(str, Location)]]
+        The id and location of the idle drivers of each region.
+    @type needs: list[int]
+        How many idle drivers each region needs.
+    @rtype: list[list[(str, int)]]
+        The id of each driver lent by each region, and the region it is lent
+        to.
+
+    >>> from location import Location
+    >>> strips = _Strips(create_event_list("events.txt"), 2)
+    >>> idle = [[("a", Location(1, 1)), ("b", Location(1, 3))], []]
+    >>> _lend(strips, idle, [1, 1])
+    [[('b', 1)], []]
+    >>> _lend(strips, idle, [2, 1])
+    [[], []]
+    """
+    total = sum(len(drivers) for drivers in idle)
+    wanted = sum(needs) + len(needs)
+    spare = [len(drivers) - total * (need + 1) // wanted
+             for drivers, need in zip(idle, needs)]
+    lent = [[] for _ in idle]
+    for region, short in enumerate(spare):
+        if short >= 0:
+            continue
+        offers = sorted((strips.distance(location, region), donor, identifier)
+                        for donor, drivers in enumerate(idle)
+                        if spare[donor] > 0
+                        for identifier, location in drivers)
+        taken = {identifier for pairs in lent for identifier, _ in pairs}
+        for _, donor, identifier in offers:
+            if short == 0:
+                break
+            if spare[donor] > 0 and identifier not in taken:
+                spare[donor] -= 1
+                short += 1
+                lent[donor].append((identifier, region))
+    return lent
+
+
+def _merge(activities, visits, monitor):
+    """Notify <monitor> of the <activities> recorded by every region, in
+    time order.
+
+    At the same time, an actor's activities are ordered by which of its
+    <visits> to a region they belong to, and then in the order they were
+    recorded.
+
+    @type activities: list[dict[str, dict[str, list[Activity]]]]
+        The activities recorded by each region's monitor.
+    @type visits: dict[(str, str), list[(int, int)]]
+        The regions each actor has been in, and when it arrived, in order.
+    @type monitor: Monitor
+    @rtype: None
+    """
+    entries = []
+    for region, recorded in enumerate(activities):
+        for category in (RIDER, DRIVER):
+            for identifier, records in recorded[category].items():
+                stops = visits[(category, identifier)]
+                arrived = [time for _, time in stops]
+                for activity in records:
+                    visit = bisect_right(arrived, activity.time) - 1
+                    while stops[visit][0] != region:
+                        visit -= 1
+                    entries.append((activity.time, visit, category,
+                                    identifier, activity))
+    entries.sort(key=lambda entry: entry[:2])
+    for time, _, category, identifier, activity in entries:
+        monitor.notify(time, category, activity.description, identifier,
+                       activity.location)
+
+
+if __name__ == "__main__":
+    events = create_event_list("events.txt")
+    print(ShardedSimulation(2).run(events))
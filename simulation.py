@@ -1,7 +1,14 @@
-from event import Event, create_event_list
-from container import PriorityQueue
+import asyncio
+import os
+import pickle
+import tempfile
+from collections import deque
+from time import perf_counter
+
+from event import Event, EventPool, create_event_list, iter_events, parse_event
+from container import Handle, PriorityQueue, TimingWheel #TimingWheel imported for doctesting
 from dispatcher import Dispatcher
-from monitor import Monitor
+from monitor import Monitor, StreamingMonitor, WindowedMonitor #StreamingMonitor and WindowedMonitor imported for doctesting
 
 
 class Simulation:
@@ -19,48 +26,903 @@ class Simulation:
     """
 
     # === Private Attributes ===
-    # @type _events: PriorityQueue[Event]
+    # @type _events: Container[Event]
     #     A sequence of events arranged in priority determined by the event
     #     sorting order.
     # @type _dispatcher: Dispatcher
     #     The dispatcher associated with the simulation.
+    # @type _monitor: Monitor
+    #     The monitor that records the activities of the simulation.
+    # @type _sample_interval: int | None
+    #     The simulated time between samples of the queue depth when the
+    #     run is profiled, or None if it is not.
+    # @type _profile: dict[str, object] | None
+    #     The profile of the last run, if it was profiled.
+    # @type _pool: EventPool
+    #     The done events kept for reuse by the events the simulation
+    #     spawns.
+    # @type _latency: list[float] | None
+    #     The seconds from reading each event to doing it, in the last live
+    #     run, if there was one.
+    # @type _stream: Iterator[Event] | None
+    #     The streamed initial events that have not been read yet, if the
+    #     run is streamed.
+    # @type _pending: Event | None
+    #     The streamed initial event read but not done yet, if any.
+    # @type _profiler: _Profiler | None
+    #     The profiler of the run in progress, if it is profiled.
 
-    def __init__(self):
+    def __init__(self, events=None, monitor=None, profile=False,
+                 sample_interval=1, dispatcher=None):
         """Initialize a Simulation.
+
+        The pending events are kept in <events>, or in a new PriorityQueue if
+        <events> is None. Since event timestamps are integers, a TimingWheel
+        can be passed instead for faster queue operations.
+
+        Activities are recorded by <monitor>, or by a new Monitor if
+        <monitor> is None. A StreamingMonitor gives the same report in
+        constant memory.
+
+        Requests are handled by <dispatcher>, or by a new Dispatcher if
+        <dispatcher> is None. A Dispatcher with a rider pool assigns drivers
+        the nearest waiting rider, and cancels riders by deadline instead of
+        by Cancellation events. Drivers drive with the travel model of the
+        dispatcher, which a monitor that is given must share, and which a
+        new Monitor is given.
+
+        If <profile> is True, run and run_live also record where their time
+        goes, which the profile method then returns. Profiling slows the run
+        down, but a run that is not profiled does next to no extra work.
+
         @type self: Simulation
+        @type events: Container | None
+            An empty container that orders events like a PriorityQueue.
+        @type monitor: Monitor | None
+            A monitor that has not been notified of any activities.
+        @type profile: bool
+        @type sample_interval: int
+            The simulated time between samples of the queue depth, when
+            profiling. Precondition: sample_interval > 0
+        @type dispatcher: Dispatcher | None
+            A dispatcher with no drivers or riders.
         @rtype: None
         """
-        self._events = PriorityQueue()
-        self._dispatcher = Dispatcher()
-        self._monitor = Monitor()
+        if events is None:
+            events = PriorityQueue()
+        if dispatcher is None:
+            dispatcher = Dispatcher()
+        if monitor is None:
+            monitor = Monitor(dispatcher.travel)
+        elif monitor.travel != dispatcher.travel:
+            raise ValueError("the monitor and the dispatcher have different travel models")
+        self._events = events
+        self._dispatcher = dispatcher
+        self._monitor = monitor
+        self._sample_interval = sample_interval if profile else None
+        self._profile = None
+        self._latency = None
+        self._pool = EventPool()
+        self._stream = None
+        self._pending = None
+        self._profiler = None
 
-    def run(self, initial_events):
+    def run(self, initial_events, stream=False, until=None):
         """Run the simulation on the list of events in <initial_events>.
         Return a dictionary containing statistics of the simulation,
         according to the specifications in the assignment handout.
+
+        If <stream> is True, <initial_events> may be any iterable, such as
+        event.iter_events, and is read one event at a time as the simulation
+        reaches it, instead of being loaded into the event queue up front.
+        The results are the same, but memory only grows with the number of
+        pending events. Streamed events must be in timestamp order: a
+        ValueError is raised on the first one that is out of order, so check
+        a file with event.is_time_sorted first, and run unsorted files
+        without <stream>.
+
+        If <until> is not None, the run stops before the first event after
+        time <until> and returns None, unless no events are left. It can
+        then be checkpointed, and carried on with resume. A run that stops
+        early can be neither streamed nor profiled.
+
         @type self: Simulation
         @type initial_events: list[Event]
             An initial list of events.
-        @rtype: dict[str, object]
+        @type stream: bool
+        @type until: int | None
+        @rtype: dict[str, object] | None
+
+        >>> wheel = Simulation(TimingWheel()).run(create_event_list("events.txt"))
+        >>> wheel == Simulation().run(create_event_list("events.txt"))
+        True
+        >>> streamed = Simulation().run(iter_events("events.txt"), stream=True)
+        >>> streamed == wheel
+        True
+        >>> Simulation(monitor=StreamingMonitor()).run(create_event_list("events.txt")) == wheel
+        True
+        >>> Simulation(profile=True).run(create_event_list("events.txt")) == wheel
+        True
+        >>> Simulation(dispatcher=Dispatcher(rider_pool=True)).run(create_event_list("events.txt")) == wheel
+        True
+        """
+        if until is not None and (stream or self._sample_interval is not None):
+            raise ValueError("a streamed or profiled run cannot stop early")
+        if self._sample_interval is not None:
+            self._profiler = _Profiler(self._events, self._monitor,
+                                       self._sample_interval)
+            self._profile = self._profiler.profile
+
+        # Add all initial events to the event queue, unless they are
+        # streamed, in which case only the next one is kept aside.
+        if stream:
+            self._stream = iter(initial_events)
+            self._pending = next(self._stream, None)
+        elif self._profiler is not None:
+            self._profiler.queue.add_all(initial_events)
+        else:
+            self._events.add_all(initial_events)
+        return self.resume(until)
+
+    def resume(self, until=None):
+        """Carry on a run that stopped early, and return a dictionary
+        containing statistics of the simulation, as run does.
+
+        If <until> is not None, stop again before the first queued event
+        after time <until> and return None, unless no events are left.
+
+        @type self: Simulation
+        @type until: int | None
+        @rtype: dict[str, object] | None
+        """
+        if self._advance(until):
+            return None
+        return self._report()
+
+    def _advance(self, until):
+        """Do the pending events in order, up to the first queued event after
+        time <until>, or until there are none left if <until> is None.
+        Return whether any events are left.
+
+        This is the event loop of every kind of run.
+
+        @type self: Simulation
+        @type until: int | None
+        @rtype: bool
         """
-        # TODO
-        #Adding the events to the queue, UNSURE ABOUT THIS ???!??
-        for event in initial_events:
-            self._events.add(event)
-        while not self._events.is_empty():
-            currentEvent = self._events.remove()
-            additionalEvents = currentEvent.do(self._dispatcher,self._monitor)
-            if additionalEvents != []:
-                for event in additionalEvents:
-                    self._events.add(event)
-        # Add all initial events to the event queue.
-
-        # Until there are no more events, remove an event
-        # from the event queue and do it. Add any returned
-        # events to the event queue.
+        # Until there are no more events, take the next event and do it.
+        # The events it spawns go straight into the event queue, and once it
+        # is done it is recycled, unless it is an initial event, which the
+        # caller may still refer to. A streamed event goes before queued
+        # events with the same timestamp, since it would have been queued
+        # before them.
+        # Once the next event comes from the queue, every queued event with
+        # its timestamp is taken out at once into a batch, and events spawned
+        # for that same time join the end of the batch instead of the queue.
+        # Since they would have been queued after every event already there,
+        # the order is the same as the queue would give.
+        # A profiled run goes through the same loop, with the event queue
+        # and the monitor timed, and each event done by the profiler. With
+        # a rider pool, the riders whose patience ran out before each event
+        # cancel first, and the events spawned are stamped with the step of
+        # the pool they were scheduled during.
+        profiler = self._profiler
+        if profiler is None:
+            events = self._events
+            monitor = self._monitor
+        else:
+            events = profiler.queue
+            monitor = profiler.monitor
+        dispatcher = self._dispatcher
+        riders = dispatcher.riderPool
+        plain = profiler is None and riders is None
+        if riders is None:
+            sink = _Sink(self._pool, events)
+        else:
+            sink = _StampingSink(self._pool, events, riders)
+        batch = sink.batch
+        release = self._pool.release
+        stream = self._stream
+        pending = self._pending
+        while True:
+            if batch:
+                currentEvent = batch.popleft()
+                if currentEvent.handle is not None and currentEvent.handle.cancelled:
+                    continue
+            elif pending is not None and (events.is_empty()
+                                          or pending <= events.peek()):
+                sink.now = None
+                currentEvent = pending
+                pending = next(stream, None)
+                if pending is not None and pending < currentEvent:
+                    raise ValueError("streamed events are not in timestamp order: "
+                                     "{} after {}".format(pending.timestamp,
+                                                          currentEvent.timestamp))
+            elif not events.is_empty():
+                if until is not None and events.peek().timestamp > until:
+                    self._pending = pending
+                    return True
+                currentEvent = events.remove()
+                sink.now = currentEvent.timestamp
+                while not events.is_empty() and events.peek().timestamp == sink.now:
+                    batch.append(events.remove())
+            else:
+                break
+            if plain:
+                currentEvent.do(dispatcher, monitor, sink)
+            else:
+                if riders is not None:
+                    dispatcher.expire_riders(monitor, currentEvent.timestamp,
+                                             0 if currentEvent.handle is None
+                                             else currentEvent.handle.step)
+                if profiler is None:
+                    currentEvent.do(dispatcher, monitor, sink)
+                else:
+                    profiler.do(currentEvent, dispatcher, monitor, sink)
+            if currentEvent.handle is not None:
+                release(currentEvent)
+
+        self._pending = None
+        return False
+
+    def _report(self):
+        """Finish the run and return the report of the monitor.
 
+        With a rider pool, the riders whose deadlines are still to come are
+        cancelled at them, as their Cancellation events would have been.
+
+        @type self: Simulation
+        @rtype: dict[str, object]
+        """
+        if self._dispatcher.riderPool is not None:
+            self._dispatcher.expire_riders(self._monitor)
+        if self._profiler is not None:
+            self._profiler.finish()
+            self._profiler = None
+        self._stream = None
         return self._monitor.report()
 
+    def checkpoint(self, filename, background=False):
+        """Save the complete state of this simulation in <filename>, so that
+        it can be restored, and its run resumed, later.
+
+        The events, drivers and riders are saved together, so objects that
+        are shared in the simulation are still shared once restored, and the
+        resumed run gives exactly the results the original run would have.
+        The checkpoint is written to a temporary file first, and then takes
+        the place of <filename> in one step, so a crash while writing never
+        leaves a partial checkpoint behind.
+
+        Everything the simulation refers to must be picklable, including
+        the callback of a WindowedMonitor: a lambda or a function defined
+        inside another function cannot be saved, and a ValueError is raised
+        instead. The events kept for reuse are not saved, since nothing
+        refers to them.
+
+        Saving takes a few seconds per million pending events and recorded
+        activities. If <background> is True and the platform can fork, the
+        checkpoint is written by a child process, which works on a snapshot
+        of this simulation, so the run can carry on at once. The process id
+        of the child is returned, to be waited for with os.waitpid before the
+        checkpoint is read; otherwise the checkpoint is written before this
+        method returns None.
+
+        @type self: Simulation
+        @type filename: str
+        @type background: bool
+        @rtype: int | None
+
+        >>> full = Simulation().run(create_event_list("events.txt"))
+        >>> simulation = Simulation()
+        >>> print(simulation.run(create_event_list("events.txt"), until=12))
+        None
+        >>> folder = tempfile.mkdtemp()
+        >>> checkpoint = os.path.join(folder, "simulation.ckpt")
+        >>> simulation.checkpoint(checkpoint)
+        >>> restored = Simulation.restore(checkpoint)
+        >>> print(restored.resume(until=20))
+        None
+        >>> writer = restored.checkpoint(checkpoint, background=True)
+        >>> os.waitpid(writer, 0)[1]
+        0
+        >>> Simulation.restore(checkpoint).resume() == full
+        True
+        >>> os.remove(checkpoint)
+        >>> windowed = Simulation(monitor=WindowedMonitor(10, lambda start, end, report: None))
+        >>> print(windowed.run(create_event_list("events.txt"), until=12))
+        None
+        >>> windowed.checkpoint(checkpoint) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        ValueError: the simulation cannot be checkpointed, since part of it cannot be pickled (...); monitor callbacks must be functions defined at the top level of a module
+        >>> os.listdir(folder)
+        []
+        >>> os.rmdir(folder)
+        """
+        if background and hasattr(os, "fork"):
+            child = os.fork()
+            if child:
+                return child
+            status = 1
+            try:
+                self.checkpoint(filename)
+                status = 0
+            finally:
+                os._exit(status)
+        folder = os.path.dirname(os.path.abspath(filename))
+        descriptor, temporary = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                try:
+                    pickle.dump(self, file, pickle.HIGHEST_PROTOCOL)
+                except (pickle.PicklingError, TypeError, AttributeError) as error:
+                    raise ValueError("the simulation cannot be checkpointed, "
+                                     "since part of it cannot be pickled ({}); "
+                                     "monitor callbacks must be functions "
+                                     "defined at the top level of a module"
+                                     .format(error)) from None
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def __getstate__(self):
+        """Return the state of this simulation to pickle, which leaves out
+        the events kept for reuse.
+
+        @type self: Simulation
+        @rtype: dict[str, object]
+        """
+        state = self.__dict__.copy()
+        del state["_pool"]
+        return state
+
+    def __setstate__(self, state):
+        """Restore the pickled <state> of a simulation, with no events kept
+        for reuse.
+
+        @type self: Simulation
+        @type state: dict[str, object]
+        @rtype: None
+        """
+        self.__dict__.update(state)
+        self._pool = EventPool()
+
+    @staticmethod
+    def restore(filename):
+        """Return the simulation saved in <filename> by checkpoint.
+
+        Only restore checkpoints from trusted sources, since they are
+        pickles.
+
+        @type filename: str
+        @rtype: Simulation
+        """
+        with open(filename, "rb") as file:
+            simulation = pickle.load(file)
+        if not isinstance(simulation, Simulation):
+            raise ValueError("{} is not a simulation checkpoint".format(filename))
+        return simulation
+
+    async def run_live(self, reader, time_scale=None, backlog=1024):
+        """Run the simulation on the event lines read from <reader> as they
+        arrive, until the end of the stream and of the events it led to.
+        Return a dictionary containing statistics of the simulation, as run
+        does.
+
+        The lines are in the format of an event file. If <time_scale> is
+        None, events are done as fast as possible, with the same results as
+        run with stream=True gives for the same lines: an event is done as
+        soon as the next line shows that no earlier one can still arrive.
+        Otherwise simulated time follows the wall clock, at <time_scale>
+        seconds per time unit, set so that the first event read is on time,
+        and each event is done when its time comes, or as soon as it is read
+        if that is later. Either way, an event read after events with later
+        times have been done is done as if it had the time of the last of
+        them.
+
+        Lines are read ahead into a buffer of <backlog> events. When the
+        simulation falls behind and the buffer fills, reading stops until
+        there is room, which pushes back on the writer of the stream.
+
+        The time from reading each event to doing it is kept, and its
+        percentiles are returned by the latency method.
+
+        @type self: Simulation
+        @type reader: asyncio.StreamReader
+            A stream of lines of bytes, such as a socket or a pipe.
+        @type time_scale: float | None
+        @type backlog: int
+            Precondition: backlog > 0
+        @rtype: dict[str, object]
+
+        >>> reader = asyncio.StreamReader()
+        >>> reader.feed_data(open("events.txt", "rb").read())
+        >>> reader.feed_eof()
+        >>> simulation = Simulation()
+        >>> live = asyncio.run(simulation.run_live(reader, backlog=4))
+        >>> live == Simulation().run(iter_events("events.txt"), stream=True)
+        True
+        >>> simulation.latency()["count"]
+        12
+        """
+        loop = asyncio.get_running_loop()
+        inbox = asyncio.Queue(backlog)
+        latency = self._latency = []
+        started = None
+        reading = loop.create_task(self._read_live(reader, inbox, loop))
+        if self._sample_interval is not None:
+            self._profiler = _Profiler(self._events, self._monitor,
+                                       self._sample_interval)
+            self._profile = self._profiler.profile
+        events = self._events
+
+        async def catch_up(until):
+            # Do the queued events up to time <until>, each batch when its
+            # time comes.
+            while not events.is_empty() and (until is None
+                                             or events.peek().timestamp <= until):
+                if time_scale is not None:
+                    await wait_for_time(events.peek().timestamp)
+                self._advance(events.peek().timestamp)
+
+        async def wait_for_time(timestamp):
+            wait = started + timestamp * time_scale - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        # Each event read is done like a streamed event, by the same event
+        # loop as run, once every queued event before it is done.
+        try:
+            self._stream = iter(())
+            now = 0
+            while True:
+                # Let the reader catch up with lines already received, then
+                # wait for the next event, but only until the next queued
+                # event is due.
+                if inbox.empty() and time_scale is not None:
+                    await asyncio.sleep(0)
+                if not inbox.empty():
+                    item = inbox.get_nowait()
+                elif time_scale is None or events.is_empty() or started is None:
+                    item = await inbox.get()
+                else:
+                    wait = started + events.peek().timestamp * time_scale - loop.time()
+                    try:
+                        item = await asyncio.wait_for(inbox.get(), max(wait, 0))
+                    except asyncio.TimeoutError:
+                        now = events.peek().timestamp
+                        self._advance(now)
+                        continue
+                if item is None:
+                    break
+                event, arrival = item
+                if started is None:
+                    started = arrival - event.timestamp * (time_scale or 0)
+                if event.timestamp < now:
+                    event.timestamp = now
+                now = event.timestamp
+                if time_scale is None:
+                    self._pending = event
+                    self._advance(now - 1)
+                else:
+                    await catch_up(now - 1)
+                    await wait_for_time(now)
+                    self._pending = event
+                    self._advance(now - 1)
+                latency.append(loop.time() - arrival)
+            if time_scale is None:
+                self._advance(None)
+            else:
+                await catch_up(None)
+        finally:
+            reading.cancel()
+        return self._report()
+
+    async def _read_live(self, reader, inbox, loop):
+        """Put each event read from <reader> into <inbox>, paired with the
+        time it was read at, and then None at the end of the stream.
+
+        @type self: Simulation
+        @type reader: asyncio.StreamReader
+        @type inbox: asyncio.Queue
+        @type loop: asyncio.AbstractEventLoop
+        @rtype: None
+        """
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            event = parse_event(line.decode("utf-8"))
+            if event is not None:
+                await inbox.put((event, loop.time()))
+        await inbox.put(None)
+
+    def latency(self):
+        """Return the number of events read in the last live run, and the
+        50th, 90th and 99th percentiles and the largest of the seconds from
+        reading each to doing it, or None if there was no live run.
+
+        @type self: Simulation
+        @rtype: dict[str, float] | None
+        """
+        if self._latency is None:
+            return None
+        times = sorted(self._latency)
+        summary = {"count": len(times)}
+        for percent in (50, 90, 99):
+            rank = max(-(-percent * len(times) // 100), 1)
+            summary["p{}".format(percent)] = times[rank - 1] if times else None
+        summary["max"] = times[-1] if times else None
+        return summary
+
+    def profile(self):
+        """Return the profile of the last run, or None if the simulation is
+        not profiled or has not been run.
+
+        The profile is a dictionary with these keys:
+        "wall_time": the seconds the run took;
+        "events": maps the name of each event class to the number of events
+            of the class that were done ("count"), the total and largest
+            seconds their do method took ("time" and "max_time"), and the
+            number of events they spawned ("spawned");
+        "queue": the number of calls to the event queue's add and remove
+            methods ("add" and "remove"), and the seconds they took
+            ("add_time" and "remove_time"), where the initial events count
+            as one call to add_all. Events spawned for the time of the event
+            being done are done in the same batch, without going through the
+            queue;
+        "notify": the number of activities the monitor was notified of
+            ("count") and the seconds that took ("time"), which is part of
+            the time of the events;
+        "depth": a list of (time, depth) samples of the number of scheduled
+            events, one at the first event done at or after each sample
+            interval of simulated time. Streamed events that have not been
+            read yet are not counted.
+
+        @type self: Simulation
+        @rtype: dict[str, object] | None
+
+        >>> simulation = Simulation(profile=True, sample_interval=10)
+        >>> _ = simulation.run(create_event_list("events.txt"))
+        >>> profile = simulation.profile()
+        >>> sorted(profile["events"])
+        ['Cancellation', 'DriverRequest', 'Dropoff', 'Pickup', 'RiderRequest']
+        >>> profile["events"]["RiderRequest"]["count"], profile["events"]["RiderRequest"]["spawned"]
+        (6, 12)
+        >>> batched = sum(stats["spawned"] for stats in profile["events"].values()) - (profile["queue"]["add"] - 1)
+        >>> profile["queue"]["remove"] + batched == sum(stats["count"] for stats in profile["events"].values())
+        True
+        >>> [time for time, depth in profile["depth"]]
+        [0, 10, 20, 30]
+        >>> print(Simulation().profile())
+        None
+        """
+        return self._profile
+
+
+class _Sink:
+    """A sink for Event.do, which makes the events spawned during a run
+    from a pool and schedules them.
+
+    Events for the current batch time join the end of the batch; all others
+    are added to the event queue.
+
+    === Attributes ===
+    @type now: int | None
+        The time of the events in the batch, or None if no batch is being
+        done.
+    @type batch: deque[Event]
+        The events to do at time <now>, in order.
+    """
+
+    __slots__ = ("now", "batch", "_make", "_add")
+
+    # === Private Attributes ===
+    # @type _make: callable
+    #     Makes an event from the pool.
+    # @type _add: callable
+    #     Adds an event to the event queue, and returns its handle.
+
+    def __init__(self, pool, events):
+        """Initialize a _Sink that makes events from <pool> and adds them to
+        <events>.
+
+        @type self: _Sink
+        @type pool: EventPool
+        @type events: Container
+        @rtype: None
+        """
+        self.now = None
+        self.batch = deque()
+        self._make = pool.make
+        self._add = events.add
+
+    def __call__(self, cls, timestamp, *args):
+        """Make an event of class <cls> at <timestamp> from <args>, schedule
+        it and return it.
+
+        @type self: _Sink
+        @type cls: type
+        @type timestamp: int
+        @rtype: Event
+        """
+        event = self._make(cls, timestamp, *args)
+        if timestamp == self.now:
+            event.handle = Handle(event)
+            self.batch.append(event)
+        else:
+            event.handle = self._add(event)
+        return event
+
+
+class _Profiler:
+    """The profiler of a run, which does each event for the event loop and
+    records where the time of the run goes.
+
+    === Attributes ===
+    @type profile: dict[str, object]
+        The profile of the run, as returned by Simulation.profile.
+    @type queue: _TimedQueue
+        The event queue of the run, timed.
+    @type monitor: _TimedMonitor
+        The monitor of the run, timed.
+    """
+
+    # === Private Attributes ===
+    # @type _sample_interval: int
+    #     The simulated time between samples of the queue depth.
+    # @type _next_sample: int | None
+    #     The time from which the next sample is taken, or None before the
+    #     first event.
+    # @type _started: float
+    #     The performance counter when the run started.
+
+    def __init__(self, events, monitor, sample_interval):
+        """Initialize a _Profiler of a run with the event queue <events> and
+        the monitor <monitor>, which samples the queue depth every
+        <sample_interval> time units.
+
+        @type self: _Profiler
+        @type events: Container
+        @type monitor: Monitor
+        @type sample_interval: int
+        @rtype: None
+        """
+        self.queue = _TimedQueue(events)
+        self.monitor = _TimedMonitor(monitor)
+        self.profile = {"wall_time": 0.0, "events": {},
+                        "queue": self.queue.stats,
+                        "notify": self.monitor.stats, "depth": []}
+        self._sample_interval = sample_interval
+        self._next_sample = None
+        self._started = perf_counter()
+
+    def do(self, event, dispatcher, monitor, sink):
+        """Do <event> as the event loop would, and record it.
+
+        @type self: _Profiler
+        @type event: Event
+        @type dispatcher: Dispatcher
+        @type monitor: _TimedMonitor
+        @type sink: _Sink
+        @rtype: None
+        """
+        if self._next_sample is None or event.timestamp >= self._next_sample:
+            waiting = sum(1 for other in sink.batch if other.handle is None
+                          or not other.handle.cancelled)
+            self.profile["depth"].append((event.timestamp,
+                                          self.queue.depth() + waiting))
+            self._next_sample = event.timestamp + self._sample_interval
+
+        added = self.queue.stats["add"]
+        batched = len(sink.batch)
+        start = perf_counter()
+        event.do(dispatcher, monitor, sink)
+        elapsed = perf_counter() - start
+        stats = self.profile["events"].get(type(event).__name__)
+        if stats is None:
+            stats = self.profile["events"][type(event).__name__] = {
+                "count": 0, "time": 0.0, "max_time": 0.0, "spawned": 0}
+        stats["count"] += 1
+        stats["time"] += elapsed
+        stats["max_time"] = max(stats["max_time"], elapsed)
+        stats["spawned"] += (self.queue.stats["add"] - added
+                             + len(sink.batch) - batched)
+
+    def finish(self):
+        """Record the end of the run.
+
+        @type self: _Profiler
+        @rtype: None
+        """
+        self.profile["wall_time"] = perf_counter() - self._started
+
+
+class _TimedQueue:
+    """A stand-in for an event queue that times the calls it passes on, and
+    keeps track of the events in it.
+
+    === Attributes ===
+    @type stats: dict[str, object]
+        The number of calls to add and remove ("add" and "remove") and the
+        seconds they took ("add_time" and "remove_time"), where adding the
+        initial events counts as one call.
+    """
+
+    # === Private Attributes ===
+    # @type _events: Container
+    #     The event queue calls are passed on to.
+    # @type _initial: int
+    #     The number of initial events in the queue.
+    # @type _scheduled: set[Handle]
+    #     The handles of the other events in the queue, some of which may
+    #     have been cancelled since.
+
+    def __init__(self, events):
+        """Initialize a _TimedQueue that passes calls on to <events>.
+
+        @type self: _TimedQueue
+        @type events: Container
+        @rtype: None
+        """
+        self._events = events
+        self._initial = 0
+        self._scheduled = set()
+        self.stats = {"add": 0, "add_time": 0.0, "remove": 0, "remove_time": 0.0}
+
+    def add(self, item):
+        """Add <item> to the queue, time it, and return its handle.
+
+        @type self: _TimedQueue
+        @type item: Event
+        @rtype: Handle
+        """
+        start = perf_counter()
+        handle = self._events.add(item)
+        self.stats["add_time"] += perf_counter() - start
+        self.stats["add"] += 1
+        self._scheduled.add(handle)
+        return handle
+
+    def add_all(self, items):
+        """Add the initial events <items> to the queue, and time it.
+
+        @type self: _TimedQueue
+        @type items: list[Event]
+        @rtype: None
+        """
+        items = list(items)
+        start = perf_counter()
+        self._events.add_all(items)
+        self.stats["add_time"] += perf_counter() - start
+        self.stats["add"] += 1
+        self._initial += len(items)
+
+    def remove(self):
+        """Remove and return the next event in the queue, and time it.
+
+        @type self: _TimedQueue
+        @rtype: Event
+        """
+        start = perf_counter()
+        item = self._events.remove()
+        self.stats["remove_time"] += perf_counter() - start
+        self.stats["remove"] += 1
+        if item.handle is None:
+            self._initial -= 1
+        else:
+            self._scheduled.discard(item.handle)
+        return item
+
+    def peek(self):
+        """Return the next event in the queue without removing it.
+
+        @type self: _TimedQueue
+        @rtype: Event
+        """
+        return self._events.peek()
+
+    def is_empty(self):
+        """Return whether the queue is empty.
+
+        @type self: _TimedQueue
+        @rtype: bool
+        """
+        return self._events.is_empty()
+
+    def depth(self):
+        """Return the number of events in the queue that are not cancelled.
+
+        @type self: _TimedQueue
+        @rtype: int
+        """
+        self._scheduled = {handle for handle in self._scheduled
+                           if not handle.cancelled}
+        return self._initial + len(self._scheduled)
+
+
+class _StampingSink(_Sink):
+    """A sink for Event.do that also stamps the handle of each event it
+    schedules with the current step of a rider pool.
+    """
+
+    __slots__ = ("_riders",)
+
+    # === Private Attributes ===
+    # @type _riders: RiderPool
+    #     The rider pool whose steps are counted.
+
+    def __init__(self, pool, events, riders):
+        """Initialize a _StampingSink that makes events from <pool>, adds
+        them to <events>, and stamps them with the step of <riders>.
+
+        @type self: _StampingSink
+        @type pool: EventPool
+        @type events: Container
+        @type riders: RiderPool
+        @rtype: None
+        """
+        _Sink.__init__(self, pool, events)
+        self._riders = riders
+
+    def __call__(self, cls, timestamp, *args):
+        """Make an event of class <cls> at <timestamp> from <args>, schedule
+        it, stamp it and return it.
+
+        @type self: _StampingSink
+        @type cls: type
+        @type timestamp: int
+        @rtype: Event
+        """
+        event = _Sink.__call__(self, cls, timestamp, *args)
+        event.handle.step = self._riders.step
+        return event
+
+
+class _TimedMonitor:
+    """A stand-in for a monitor that times the notifications it passes on.
+
+    === Attributes ===
+    @type stats: dict[str, object]
+        The number of notifications ("count") and the seconds they took
+        ("time").
+    """
+
+    # === Private Attributes ===
+    # @type _monitor: Monitor
+    #     The monitor notifications are passed on to.
+
+    def __init__(self, monitor):
+        """Initialize a _TimedMonitor that passes notifications on to
+        <monitor>.
+
+        @type self: _TimedMonitor
+        @type monitor: Monitor
+        @rtype: None
+        """
+        self._monitor = monitor
+        self.stats = {"count": 0, "time": 0.0}
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity, and time it.
+
+        @type self: _TimedMonitor
+        @type timestamp: int
+        @type category: DRIVER | RIDER
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+        @type identifier: str
+        @type location: Location
+        @rtype: None
+        """
+        start = perf_counter()
+        self._monitor.notify(timestamp, category, description, identifier,
+                             location)
+        self.stats["time"] += perf_counter() - start
+        self.stats["count"] += 1
+
 
 if __name__ == "__main__":
     events = create_event_list("events.txt")
@@ -0,0 +1,162 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from dispatcher import Dispatcher
+from driver import Driver
+from event import DriverRequest, RiderRequest, create_event_list
+from location import manhattan_distance
+from rider import Rider, WAITING
+from simulation import Simulation
+
+"""
+The sweep module runs many variants of the same scenario in parallel, one
+Simulation per variant, spread over a pool of worker processes.
+
+A variant is described by a dictionary of parameters, each of which
+changes the base event list:
+
+=== Parameters ===
+fleet_size: int
+    Only the first fleet_size DriverRequests in the event file are kept.
+speed: int
+    Every driver has this speed.
+patience: int
+    Every rider has this patience.
+"""
+
+PARAMETERS = ("fleet_size", "speed", "patience")
+
+# The base events of the worker process, loaded once by _load_events.
+_base_events = None
+
+# The travel model of the worker process, set by _load_events.
+_travel = manhattan_distance
+
+
+def run_sweep(filename, grid, max_workers=None, travel=manhattan_distance):
+    """Run a Simulation for every combination of the parameter values in
+    <grid>, on variants of the events in <filename>, and return a table
+    with one row per combination.
+
+    Each row holds the parameters of the variant followed by the report
+    of its simulation. Rows are in the order of itertools.product over the
+    values in <grid>. Each worker process parses <filename> once, when it
+    starts, and is given its own copy of the travel model <travel>.
+
+    @type filename: str
+        The name of a file in the format read by event.create_event_list.
+    @type grid: dict[str, list[int]]
+        The values to try for each parameter; see the module docstring.
+    @type max_workers: int | None
+        The number of worker processes, or None for one per processor.
+    @type travel: callable
+        The distance driven from one location to another, which must be
+        picklable, such as the distance method of a roads.RoadNetwork.
+    @rtype: list[dict[str, object]]
+
+    >>> rows = run_sweep("events.txt", {"fleet_size": [3, 6], "speed": [1]}, 2)
+    >>> [(row["fleet_size"], row["speed"]) for row in rows]
+    [(3, 1), (6, 1)]
+    >>> rows[1]["driver_ride_distance"] == Simulation().run(create_event_list("events.txt"))["driver_ride_distance"]
+    True
+    """
+    for name in grid:
+        if name not in PARAMETERS:
+            raise ValueError("unknown sweep parameter: {}".format(name))
+    names = list(grid)
+    scenarios = [dict(zip(names, values)) for values in product(*grid.values())]
+    with ProcessPoolExecutor(max_workers, initializer=_load_events,
+                             initargs=(filename, travel)) as pool:
+        reports = list(pool.map(_run_scenario, scenarios))
+    return [dict(scenario, **report) for scenario, report in zip(scenarios, reports)]
+
+
+def save_table(rows, filename):
+    """Write the table <rows> returned by run_sweep to the CSV file
+    <filename>.
+
+    @type rows: list[dict[str, object]]
+    @type filename: str
+    @rtype: None
+    """
+    if not rows:
+        return
+    with open(filename, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_scenario(events, scenario):
+    """Return a fresh copy of <events> changed according to <scenario>.
+
+    The copies get their own drivers and riders, since a simulation changes
+    them, but share the immutable locations of <events>.
+
+    @type events: list[Event]
+        DriverRequest and RiderRequest events, as create_event_list returns.
+    @type scenario: dict[str, int]
+        The parameters of the variant; see the module docstring.
+    @rtype: list[Event]
+
+    >>> events = build_scenario(create_event_list("events.txt"), {"fleet_size": 1, "patience": 3})
+    >>> for event in events[:3]: print(event)
+    0 -- Driver: Amaranth, located at 1,1: Request a rider
+    0 -- Almond waiting: Request a driver
+    5 -- Bisque waiting: Request a driver
+    >>> events[1].rider.patience
+    3
+    """
+    fleet_size = scenario.get("fleet_size")
+    speed = scenario.get("speed")
+    patience = scenario.get("patience")
+    copies = []
+    drivers = 0
+    for event in events:
+        if isinstance(event, DriverRequest):
+            if fleet_size is not None and drivers == fleet_size:
+                continue
+            drivers += 1
+            driver = event.driver
+            copies.append(DriverRequest(event.timestamp, Driver(
+                driver.id, driver.location,
+                driver.speed if speed is None else speed)))
+        elif isinstance(event, RiderRequest):
+            rider = event.rider
+            copies.append(RiderRequest(event.timestamp, Rider(
+                rider.id, WAITING, rider.destination, rider.location,
+                rider.patience if patience is None else patience)))
+    return copies
+
+
+def _load_events(filename, travel):
+    """Parse the base events of this worker process from <filename>, and
+    make <travel> its travel model.
+
+    @type filename: str
+    @type travel: callable
+    @rtype: None
+    """
+    global _base_events, _travel
+    _base_events = create_event_list(filename)
+    _travel = travel
+
+
+def _run_scenario(scenario):
+    """Run a Simulation of <scenario> on the base events of this worker
+    process and return its report.
+
+    @type scenario: dict[str, int]
+    @rtype: dict[str, object]
+    """
+    return Simulation(dispatcher=Dispatcher(travel=_travel)).run(
+        build_scenario(_base_events, scenario))
+
+
+if __name__ == "__main__":
+    table = run_sweep("events.txt", {"fleet_size": [2, 4, 6],
+                                     "speed": [1, 2],
+                                     "patience": [5, 10]})
+    for row in table:
+        print(row)
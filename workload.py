@@ -0,0 +1,226 @@
+import numpy as np
+
+from eventfile import HEADER, RECORD, LENGTH, MAGIC, VERSION, DRIVER_REQUEST, RIDER_REQUEST
+
+"""
+The workload module generates large, random event files for the simulation,
+in the text format read by event.create_event_list or in the binary format
+read by eventfile.iter_binary_events.
+
+A workload has a fleet of drivers that all request a rider at time 0, and
+a stream of riders that arrive as a Poisson process. The events are written
+in timestamp order, a chunk at a time, so a workload of any size is written
+in constant memory. The same seed and settings always give the same file.
+
+This module needs NumPy; the rest of the simulation does not.
+
+=== Constants ===
+@type CHUNK: int
+    The number of riders generated at a time.
+"""
+
+CHUNK = 1 << 16
+
+# The layout of eventfile.RECORD, as a NumPy record.
+_RECORD = np.dtype({"names": ["timestamp", "kind", "index", "row", "column",
+                              "destination_row", "destination_column", "value"],
+                    "formats": ["<i8", "u1", "<u4", "<i4", "<i4", "<i4", "<i4", "<i4"],
+                    "offsets": [0, 8, 12, 16, 20, 24, 28, 32],
+                    "itemsize": RECORD.size})
+
+_DRIVER_LINE = "%d DriverRequest d%d %d,%d %d\n"
+_RIDER_LINE = "%d RiderRequest r%d %d,%d %d,%d %d\n"
+
+
+def write_workload(filename, riders, seed=0, grid_size=50, fleet_size=100,
+                   rate=1.0, hotspots=0, hotspot_share=0.5,
+                   hotspot_spread=2.0, patience=(5, 30), speeds=(1, 2, 3),
+                   binary=False):
+    """Write a random workload to <filename> and return the number of events
+    written.
+
+    Drivers are named d0, d1, ... and riders r0, r1, ... in the order of
+    their requests. Locations are on a <grid_size> by <grid_size> grid, from
+    0,0 to grid_size - 1,grid_size - 1.
+
+    @type filename: str
+    @type riders: int
+        The number of riders.
+    @type seed: int
+        The seed of the random numbers.
+    @type grid_size: int
+        The number of rows, and of columns, of the grid.
+    @type fleet_size: int
+        The number of drivers, placed uniformly on the grid.
+    @type rate: float
+        The average number of riders that arrive per time unit.
+    @type hotspots: int
+        The number of hotspots, placed uniformly on the grid.
+    @type hotspot_share: float
+        The share of rider origins, and of destinations, that are near a
+        hotspot rather than uniform over the grid, if there are hotspots.
+    @type hotspot_spread: float
+        The standard deviation, in blocks, of the row and column of a
+        location near a hotspot.
+    @type patience: (int, int)
+        The lowest and highest patience of a rider, drawn uniformly.
+    @type speeds: list[int]
+        The speeds a driver may have, drawn uniformly.
+    @type binary: bool
+        Write the binary format of the eventfile module instead of text.
+    @rtype: int
+
+    >>> import os, tempfile
+    >>> from event import create_event_list, is_time_sorted
+    >>> from eventfile import iter_binary_events
+    >>> folder = tempfile.mkdtemp()
+    >>> text = os.path.join(folder, "events.txt")
+    >>> write_workload(text, 1000, seed=7, fleet_size=20, hotspots=3)
+    1020
+    >>> events = create_event_list(text)
+    >>> print(events[20])
+    0 -- r0 waiting: Request a driver
+    >>> is_time_sorted(text)
+    True
+    >>> binary = os.path.join(folder, "events.bin")
+    >>> write_workload(binary, 1000, seed=7, fleet_size=20, hotspots=3, binary=True)
+    1020
+    >>> [str(event) for event in iter_binary_events(binary)] == [str(event) for event in events]
+    True
+    >>> again = os.path.join(folder, "again.txt")
+    >>> _ = write_workload(again, 1000, seed=7, fleet_size=20, hotspots=3)
+    >>> open(again).read() == open(text).read()
+    True
+    >>> for name in (text, binary, again): os.remove(name)
+    >>> os.rmdir(folder)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.integers(0, grid_size, size=(hotspots, 2))
+    settings = (grid_size, centers, hotspot_share, hotspot_spread)
+    chunks = _generate(rng, riders, fleet_size, rate, settings, patience,
+                       np.asarray(speeds))
+    if binary:
+        with open(filename, "wb") as file:
+            _write_binary(file, chunks, fleet_size, riders)
+    else:
+        with open(filename, "w") as file:
+            _write_text(file, chunks)
+    return fleet_size + riders
+
+
+def _generate(rng, riders, fleet_size, rate, settings, patience, speeds):
+    """Yield the events of a workload in timestamp order, as chunks of
+    columns: the event kind, then arrays of the timestamp, the index of the
+    driver or rider, the row and column of the location or origin, the row
+    and column of the destination, and the speed or patience.
+
+    @type rng: numpy.random.Generator
+    @type riders: int
+    @type fleet_size: int
+    @type rate: float
+    @type settings: (int, numpy.ndarray, float, float)
+        The grid size, hotspots, hotspot share and hotspot spread.
+    @type patience: (int, int)
+    @type speeds: numpy.ndarray
+    @rtype: iterator[(int, numpy.ndarray, ...)]
+    """
+    grid_size = settings[0]
+    for first in range(0, fleet_size, CHUNK):
+        count = min(CHUNK, fleet_size - first)
+        zeros = np.zeros(count, dtype=np.int64)
+        yield (DRIVER_REQUEST, zeros, np.arange(first, first + count),
+               rng.integers(0, grid_size, count), rng.integers(0, grid_size, count),
+               zeros, zeros, speeds[rng.integers(0, len(speeds), count)])
+    clock = 0.0
+    for first in range(0, riders, CHUNK):
+        count = min(CHUNK, riders - first)
+        times = clock + np.cumsum(rng.exponential(1 / rate, count))
+        clock = times[-1]
+        origin_rows, origin_columns = _locations(rng, count, settings)
+        rows, columns = _locations(rng, count, settings)
+        yield (RIDER_REQUEST, times.astype(np.int64), np.arange(first, first + count),
+               origin_rows, origin_columns, rows, columns,
+               rng.integers(patience[0], patience[1] + 1, count))
+
+
+def _locations(rng, count, settings):
+    """Return the rows and columns of <count> random locations, each near a
+    random hotspot or uniform over the grid.
+
+    @type rng: numpy.random.Generator
+    @type count: int
+    @type settings: (int, numpy.ndarray, float, float)
+        The grid size, hotspots, hotspot share and hotspot spread.
+    @rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    grid_size, centers, share, spread = settings
+    rows = rng.integers(0, grid_size, count)
+    columns = rng.integers(0, grid_size, count)
+    if len(centers):
+        near = rng.random(count) < share
+        chosen = centers[rng.integers(0, len(centers), int(near.sum()))]
+        offsets = np.rint(rng.normal(0, spread, size=chosen.shape)).astype(np.int64)
+        spot = np.clip(chosen + offsets, 0, grid_size - 1)
+        rows[near] = spot[:, 0]
+        columns[near] = spot[:, 1]
+    return rows, columns
+
+
+def _write_text(file, chunks):
+    """Write <chunks> to the text <file>, one line per event.
+
+    Each chunk is formatted by a single string operation.
+
+    @type file: io.TextIOWrapper
+    @type chunks: iterator[(int, numpy.ndarray, ...)]
+    @rtype: None
+    """
+    for kind, timestamps, indices, rows, columns, destination_rows, \
+            destination_columns, values in chunks:
+        if kind == DRIVER_REQUEST:
+            line = _DRIVER_LINE
+            fields = (timestamps, indices, rows, columns, values)
+        else:
+            line = _RIDER_LINE
+            fields = (timestamps, indices, rows, columns, destination_rows,
+                      destination_columns, values)
+        file.write(line * len(timestamps)
+                   % tuple(np.column_stack(fields).ravel().tolist()))
+
+
+def _write_binary(file, chunks, fleet_size, riders):
+    """Write <chunks> to the binary <file>, followed by the identifier table
+    of <fleet_size> drivers and <riders> riders.
+
+    @type file: io.BufferedWriter
+    @type chunks: iterator[(int, numpy.ndarray, ...)]
+    @type fleet_size: int
+    @type riders: int
+    @rtype: None
+    """
+    file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+    for kind, timestamps, indices, rows, columns, destination_rows, \
+            destination_columns, values in chunks:
+        records = np.zeros(len(timestamps), dtype=_RECORD)
+        records["timestamp"] = timestamps
+        records["kind"] = kind
+        # Riders come after the drivers in the identifier table.
+        records["index"] = indices if kind == DRIVER_REQUEST else indices + fleet_size
+        records["row"] = rows
+        records["column"] = columns
+        records["destination_row"] = destination_rows
+        records["destination_column"] = destination_columns
+        records["value"] = values
+        file.write(records.tobytes())
+    offset = file.tell()
+    for prefix, count in (("d", fleet_size), ("r", riders)):
+        for first in range(0, count, CHUNK):
+            file.write(b"".join(LENGTH.pack(len(name)) + name for name in
+                                (("%s%d" % (prefix, index)).encode("utf-8")
+                                 for index in range(first, min(first + CHUNK, count)))))
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, VERSION, fleet_size + riders, offset))
+
+
+if __name__ == "__main__":
+    write_workload("workload.txt", 100000, fleet_size=1000, hotspots=5)